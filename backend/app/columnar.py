@@ -0,0 +1,98 @@
+import io
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # Arrow output is optional
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Column types per collection, in output order
+SENSOR_COLUMNS = {
+    "timestamp": "datetime",
+    "temperature": "float",
+    "humidity": "float",
+    "moisture": "float",
+    "light": "float",
+    "water_level": "float",
+}
+WATERING_COLUMNS = {
+    "timestamp": "datetime",
+    "amount": "float",
+    "mode": "str",
+    "duration": "float",
+    "moisture_before": "float",
+    "moisture_after": "float",
+    "success": "bool",
+}
+
+_CASTS = {
+    "float": float,
+    "str": str,
+    "bool": bool,
+    "datetime": lambda value: value if isinstance(value, datetime) else None,
+}
+
+
+def select_columns(schema: Dict[str, str], fields: Optional[str]) -> Dict[str, str]:
+    """Restrict a column schema to `fields=a,b,c` (unknown names are ignored)"""
+    if not fields:
+        return dict(schema)
+    wanted = [name.strip() for name in fields.split(",")]
+    return {name: schema[name] for name in wanted if name in schema}
+
+
+def projection_for(schema: Dict[str, str]) -> Dict[str, int]:
+    projection = {name: 1 for name in schema}
+    projection["_id"] = 0
+    return projection
+
+
+def build_columns(docs: Iterable[Dict], schema: Dict[str, str]) -> Dict[str, List]:
+    """
+    Fill one list per column straight from a Mongo cursor.
+
+    Values are cast to the column type; missing or invalid values become None
+    so every column has the same length.
+    """
+    columns: Dict[str, List] = {name: [] for name in schema}
+    appenders = [(name, columns[name].append, _CASTS[kind]) for name, kind in schema.items()]
+    for doc in docs:
+        for name, append, cast in appenders:
+            value = doc.get(name)
+            if value is None:
+                append(None)
+                continue
+            try:
+                append(cast(value))
+            except (TypeError, ValueError):
+                append(None)
+    return columns
+
+
+def columnar_payload(columns: Dict[str, List]) -> Dict:
+    count = len(next(iter(columns.values()))) if columns else 0
+    return {"format": "columnar", "count": count, "columns": columns}
+
+
+_ARROW_TYPES = {
+    "float": lambda: pa.float64(),
+    "str": lambda: pa.string(),
+    "bool": lambda: pa.bool_(),
+    "datetime": lambda: pa.timestamp("ms"),
+}
+
+
+def arrow_ipc(columns: Dict[str, List], schema: Dict[str, str]) -> bytes:
+    """Serialize columns as an Arrow IPC stream (requires pyarrow)"""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    arrays = [pa.array(columns[name], type=_ARROW_TYPES[kind]()) for name, kind in schema.items()]
+    table = pa.Table.from_arrays(arrays, names=list(schema))
+    sink = io.BytesIO()
+    with pa_ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
@@ -0,0 +1,74 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    All environment-driven settings in one place.
+
+    Reading the config never touches the network and never fails on a
+    missing variable; the clients that need a value complain when they are
+    first used (see app.container).
+    """
+
+    mongodb_uri: Optional[str]
+    database_name: str
+    mongo_timeout_ms: int
+    cloudinary_cloud_name: Optional[str]
+    cloudinary_api_key: Optional[str]
+    cloudinary_api_secret: Optional[str]
+    mqtt_enabled: bool
+    mqtt_broker: str
+    mqtt_port: int
+    allowed_origins: List[str]
+    trace_file: Optional[str]
+    trace_file_max_bytes: int
+    trace_collector_url: Optional[str]
+    trace_sample_rate: float
+    profile_dir: str
+    archive_dir: str
+    archive_format: str
+    compaction_interval_hours: float
+    sensor_raw_retention_days: int
+    command_retention_days: int
+    image_retention_days: int
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        env = os.getenv
+        return cls(
+            mongodb_uri=env("MONGODB_URI"),
+            database_name=env("DATABASE_NAME", "TomatoBuddy"),
+            mongo_timeout_ms=int(env("MONGO_TIMEOUT_MS", "5000")),
+            cloudinary_cloud_name=env("CLOUDINARY_CLOUD_NAME"),
+            cloudinary_api_key=env("CLOUDINARY_API_KEY"),
+            cloudinary_api_secret=env("CLOUDINARY_API_SECRET"),
+            mqtt_enabled=env("MQTT_ENABLED", "1").lower() not in ("0", "false", "no"),
+            mqtt_broker=env("MQTT_BROKER", "10.211.222.46"),
+            mqtt_port=int(env("MQTT_PORT", "1883")),
+            allowed_origins=env("ALLOWED_ORIGINS", "*").split(","),
+            trace_file=env("TRACE_FILE"),
+            trace_file_max_bytes=int(env("TRACE_FILE_MAX_BYTES", str(5 * 1024 * 1024))),
+            trace_collector_url=env("TRACE_COLLECTOR_URL"),
+            trace_sample_rate=float(env("TRACE_SAMPLE_RATE", "0.1")),
+            profile_dir=env("PROFILE_DIR", "profiles"),
+            archive_dir=env("ARCHIVE_DIR", "archive"),
+            archive_format=env("ARCHIVE_FORMAT", "jsonl"),  # jsonl | parquet
+            compaction_interval_hours=float(env("COMPACTION_INTERVAL_HOURS", "6")),
+            sensor_raw_retention_days=int(env("SENSOR_RAW_RETENTION_DAYS", "30")),
+            command_retention_days=int(env("COMMAND_RETENTION_DAYS", "90")),
+            # Off by default: image metadata feeds the gallery and rebuild_disease_stats
+            image_retention_days=int(env("IMAGE_RETENTION_DAYS", "0")),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Load .env once (variables already set in the environment win)"""
+    load_dotenv()
+    return Config.from_env()
@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from app.config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class Container:
+    """
+    Process-wide clients (MongoDB, MQTT), created on first use.
+
+    Nothing connects at import time: pymongo and paho are imported and their
+    clients built only when something first needs them. main.lifespan owns
+    the container and closes it on shutdown.
+
+    Clients are not shared across fork(): a child process (e.g. a gunicorn
+    worker forked after the parent touched the database) drops the inherited
+    references and builds its own on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._mongo = None
+        self._mqtt = None
+        # Set by main.lifespan, reported by /health/ready
+        self.status: Dict[str, str] = {"database": "pending"}
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+    def _reset_after_fork(self):
+        # Do not close: the sockets belong to the parent process
+        self._pid = os.getpid()
+        self._mongo = None
+        self._mqtt = None
+        self._lock = threading.Lock()
+
+    # -------------------- MongoDB --------------------
+
+    @property
+    def mongo(self):
+        self._check_pid()
+        if self._mongo is None:
+            with self._lock:
+                if self._mongo is None:
+                    from pymongo import MongoClient
+
+                    config = get_config()
+                    if not config.mongodb_uri:
+                        raise RuntimeError("MONGODB_URI is not set in the environment.")
+                    # connect=False: no background connection until the first operation
+                    self._mongo = MongoClient(
+                        config.mongodb_uri,
+                        connect=False,
+                        serverSelectionTimeoutMS=config.mongo_timeout_ms,
+                    )
+        return self._mongo
+
+    @property
+    def db(self):
+        return self.mongo[get_config().database_name]
+
+    def ping_mongo(self) -> Optional[str]:
+        """None if MongoDB answers, else the error message"""
+        try:
+            self.db.command("ping")
+            return None
+        except Exception as e:
+            return str(e)[:200]
+
+    # -------------------- MQTT --------------------
+
+    @property
+    def mqtt(self):
+        self._check_pid()
+        if self._mqtt is None:
+            with self._lock:
+                if self._mqtt is None:
+                    import paho.mqtt.client as mqtt
+
+                    self._mqtt = mqtt.Client()
+        return self._mqtt
+
+    @property
+    def mqtt_started(self) -> bool:
+        return self._mqtt is not None
+
+    def close(self):
+        if self._mqtt is not None:
+            try:
+                # DISCONNECT first, while the loop thread can still flush it;
+                # otherwise the broker sees an unclean drop and fires any will
+                self._mqtt.disconnect()
+                self._mqtt.loop_stop()
+            except Exception as e:
+                logger.warning(f"MQTT shutdown failed: {e}")
+            self._mqtt = None
+        if self._mongo is not None:
+            self._mongo.close()
+            self._mongo = None
+
+
+class DatabaseProxy:
+    """
+    Stands in for the pymongo Database at module level (`db.sensor_readings`,
+    `db["image_data"]`), resolving to the container's client on each access.
+    """
+
+    def __getattr__(self, name):
+        return getattr(container.db, name)
+
+    def __getitem__(self, name):
+        return container.db[name]
+
+
+container = Container()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=container._reset_after_fork)
@@ -1,5 +1,11 @@
 from app.database.cloudinary import init_cloudinary
+from app.database.analytics import init_analytics_indexes
+from app.database.retention import init_retention_indexes
+from app.database.dead_letters import init_dead_letter_collection
 
 def init_database():
     init_cloudinary()
+    init_analytics_indexes()
+    init_retention_indexes()
+    init_dead_letter_collection()
     
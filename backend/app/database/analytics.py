@@ -0,0 +1,219 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+from app.database.mongodb import db
+
+logger = logging.getLogger(__name__)
+
+# Confidence histogram: 10 buckets of width 0.1
+HISTOGRAM_BUCKETS = 10
+HEALTHY_LABEL = "Healthy"
+
+# Counters are kept at two levels, both updated on every inference:
+#   disease_daily  - one document per (day, label)
+#   disease_totals - one document per label for the whole season
+# so summaries never have to scan image_data.
+
+
+COUNTER_COLLECTIONS = ("disease_daily", "disease_totals")
+
+# Set while rebuild_disease_stats runs: inferences recorded meanwhile are
+# also kept here, to be folded into the rebuilt counters before the swap
+_pending: Optional[List[tuple]] = None
+_pending_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def _create_counter_indexes(daily, totals):
+    daily.create_index([("day", ASCENDING), ("label", ASCENDING)], unique=True)
+    totals.create_index([("label", ASCENDING)], unique=True)
+
+
+def init_analytics_indexes():
+    _create_counter_indexes(db.disease_daily, db.disease_totals)
+
+
+def _counter_update(confidence: float, timestamp: datetime, duplicate: bool) -> Dict:
+    bucket = min(max(int(confidence * HISTOGRAM_BUCKETS), 0), HISTOGRAM_BUCKETS - 1)
+    return {
+        "$inc": {
+            "count": 1,
+            "duplicates": 1 if duplicate else 0,
+            "confidence_sum": confidence,
+            f"histogram.{bucket}": 1,
+        },
+        "$min": {"first_seen": timestamp},
+        "$max": {"last_seen": timestamp},
+    }
+
+
+def _counter_ops(prediction: str, confidence: float, timestamp: datetime, duplicate: bool):
+    update = _counter_update(confidence, timestamp, duplicate)
+    day = timestamp.strftime("%Y-%m-%d")
+    return (
+        UpdateOne({"day": day, "label": prediction}, update, upsert=True),
+        UpdateOne({"label": prediction}, update, upsert=True),
+    )
+
+
+def record_inference(
+    prediction: str,
+    confidence: float,
+    timestamp: Optional[datetime] = None,
+    duplicate: bool = False,
+    image_id: Optional[str] = None,
+) -> bool:
+    """Fold one inference into the daily and season counters"""
+    try:
+        timestamp = timestamp or datetime.now()
+        daily_op, totals_op = _counter_ops(prediction, confidence, timestamp, duplicate)
+        with _pending_lock:
+            if _pending is not None:
+                _pending.append((image_id, prediction, confidence, timestamp, duplicate))
+            db.disease_daily.bulk_write([daily_op])
+            db.disease_totals.bulk_write([totals_op])
+        return True
+    except Exception as e:
+        logger.error(f"Failed to record inference analytics: {e}")
+        return False
+
+
+def _format_counter(doc: Dict) -> Dict:
+    count = doc.get("count", 0)
+    histogram = doc.get("histogram", {})
+    return {
+        "label": doc["label"],
+        "count": count,
+        "duplicates": doc.get("duplicates", 0),
+        "mean_confidence": round(doc.get("confidence_sum", 0.0) / count, 4) if count else None,
+        "confidence_histogram": [histogram.get(str(i), 0) for i in range(HISTOGRAM_BUCKETS)],
+        "first_seen": doc.get("first_seen"),
+        "last_seen": doc.get("last_seen"),
+    }
+
+
+# GET Functions
+def get_disease_summary() -> Dict:
+    """Season-wide prevalence per label, read from the per-label totals"""
+    try:
+        labels = [_format_counter(doc) for doc in db.disease_totals.find({}, {"_id": 0})]
+        total = sum(item["count"] for item in labels)
+        for item in labels:
+            item["prevalence"] = round(item["count"] / total, 4) if total else 0.0
+        labels.sort(key=lambda item: item["count"], reverse=True)
+        return {"total": total, "labels": labels}
+    except Exception as e:
+        logger.error(f"Failed to retrieve disease summary: {e}")
+        return {"total": 0, "labels": []}
+
+
+def get_disease_daily(days: int = 30, label: Optional[str] = None) -> List[Dict]:
+    """Per-day, per-label counters for the last `days` days"""
+    try:
+        start_day = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        query = {"day": {"$gte": start_day}}
+        if label:
+            query["label"] = label
+        docs = db.disease_daily.find(query, {"_id": 0}).sort(
+            [("day", ASCENDING), ("label", ASCENDING)]
+        )
+        return [{"day": doc["day"], **_format_counter(doc)} for doc in docs]
+    except Exception as e:
+        logger.error(f"Failed to retrieve daily disease stats: {e}")
+        return []
+
+
+def get_new_disease_alerts(days: int = 7) -> List[Dict]:
+    """Diseases (non-healthy labels) seen for the first time in the last `days` days"""
+    try:
+        threshold = datetime.now() - timedelta(days=days)
+        docs = db.disease_totals.find(
+            {"label": {"$ne": HEALTHY_LABEL}, "first_seen": {"$gte": threshold}},
+            {"_id": 0},
+        ).sort("first_seen", -1)
+        return [_format_counter(doc) for doc in docs]
+    except Exception as e:
+        logger.error(f"Failed to retrieve disease alerts: {e}")
+        return []
+
+
+def rebuild_disease_stats(batch_size: int = 1000) -> int:
+    """
+    Recompute both counter collections from image_data.
+
+    Only needed once for records ingested before analytics existed, or after
+    manual edits to image_data. Returns the number of inferences folded in.
+
+    The counters are rebuilt into `<name>_rebuild` collections and swapped in
+    with renameCollection, so readers never see them half built. image_data
+    is scanned up to the newest document at the start; inferences recorded
+    during the scan are folded in just before the swap (unless the scan
+    already covered them), so none are lost or counted twice.
+    """
+    global _pending
+    if not _rebuild_lock.acquire(blocking=False):
+        raise RuntimeError("A disease stats rebuild is already running")
+    daily = db["disease_daily_rebuild"]
+    totals = db["disease_totals_rebuild"]
+    try:
+        daily.drop()
+        totals.drop()
+        _create_counter_indexes(daily, totals)
+        with _pending_lock:
+            _pending = []
+            newest = db.image_data.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        cutoff = {"_id": {"$lte": newest["_id"]}} if newest else {"_id": None}
+
+        processed = 0
+        daily_ops: List[UpdateOne] = []
+        totals_ops: List[UpdateOne] = []
+        projection = {"prediction": 1, "confidence": 1, "timestamp": 1, "duplicate_of": 1}
+        for doc in db.image_data.find(cutoff, projection):
+            daily_op, totals_op = _counter_ops(
+                doc.get("prediction", ""),
+                float(doc.get("confidence", 0.0)),
+                doc.get("timestamp") or datetime.now(),
+                bool(doc.get("duplicate_of")),
+            )
+            daily_ops.append(daily_op)
+            totals_ops.append(totals_op)
+            processed += 1
+            if len(daily_ops) >= batch_size:
+                daily.bulk_write(daily_ops)
+                totals.bulk_write(totals_ops)
+                daily_ops, totals_ops = [], []
+
+        # Ingest waits on _pending_lock from here until the swap is done
+        with _pending_lock:
+            scanned = set()
+            ids = [item[0] for item in _pending if item[0]]
+            if ids and newest:
+                query = {"image_id": {"$in": ids}, **cutoff}
+                scanned = {doc["image_id"] for doc in db.image_data.find(query, {"image_id": 1})}
+            for image_id, *inference in _pending:
+                if image_id in scanned:
+                    continue
+                daily_op, totals_op = _counter_ops(*inference)
+                daily_ops.append(daily_op)
+                totals_ops.append(totals_op)
+                processed += 1
+            if daily_ops:
+                daily.bulk_write(daily_ops)
+                totals.bulk_write(totals_ops)
+            for name in COUNTER_COLLECTIONS:
+                db[f"{name}_rebuild"].rename(name, dropTarget=True)
+            _pending = None
+    except Exception:
+        with _pending_lock:
+            _pending = None
+        daily.drop()
+        totals.drop()
+        raise
+    finally:
+        _rebuild_lock.release()
+    logger.info(f"Disease stats rebuilt from {processed} inferences")
+    return processed
@@ -1,25 +1,31 @@
-import os
 import uuid
 from datetime import datetime
+from typing import Dict, Optional
 
 import cloudinary
 import cloudinary.uploader
-from dotenv import load_dotenv
 
+from app.config import get_config
 from app.database.mongodb import save_image_data
 
-load_dotenv()
+# Renditions generated next to each original (Cloudinary eager transformations).
+# The same transformation strings are used to build the URLs returned by the API.
+RENDITIONS = {
+    "thumbnail": "c_fill,w_256,h_256,q_auto",
+    "medium": "c_limit,w_640,q_auto",
+}
 
 
 def init_cloudinary():
     """
-    Initialize Cloudinary configuration using environment variables.
+    Initialize Cloudinary configuration from app.config.
     This should be called once during app startup.
     """
+    config = get_config()
     cloudinary.config(
-        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-        api_key=os.getenv("CLOUDINARY_API_KEY"),
-        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+        cloud_name=config.cloudinary_cloud_name,
+        api_key=config.cloudinary_api_key,
+        api_secret=config.cloudinary_api_secret,
     )
 
 
@@ -37,8 +43,29 @@ def generate_image_ids() -> tuple[str, str]:
     return public_id, image_id
 
 
+def rendition_urls(image_url: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Build per-rendition URLs for a Cloudinary image URL.
+
+    The transformation is inserted right after `/image/upload/`. Non-Cloudinary
+    URLs (or missing ones) fall back to the original for every rendition.
+    """
+    urls: Dict[str, Optional[str]] = {"original": image_url}
+    marker = "/image/upload/"
+    for name, transformation in RENDITIONS.items():
+        if image_url and marker in image_url:
+            head, tail = image_url.split(marker, 1)
+            urls[name] = f"{head}{marker}{transformation}/{tail}"
+        else:
+            urls[name] = image_url
+    return urls
+
+
 def upload_image(
-    image_binary: bytes, prediction: str = "unknown", confidence: float = 0.0
+    image_binary: bytes,
+    prediction: str = "unknown",
+    confidence: float = 0.0,
+    save_metadata: bool = True,
 ):
     """
     Upload an image to Cloudinary and save metadata to MongoDB.
@@ -47,6 +74,8 @@ def upload_image(
         image_binary (bytes): Raw image data
         prediction (str): Prediction label
         confidence (float): Confidence score of the prediction
+        save_metadata (bool): Also insert an image_data record. Callers that
+            save their own record (e.g. the MQTT inference handler) pass False.
 
     Returns:
         (bool, str, Optional[str]): (Success, Message, Image URL if successful)
@@ -60,6 +89,7 @@ def upload_image(
             public_id=public_id,
             folder="tomato_buddy",
             resource_type="image",
+            eager=[{"raw_transformation": t} for t in RENDITIONS.values()],
         )
 
         # Extract the secure image URL
@@ -68,7 +98,8 @@ def upload_image(
             raise ValueError("Cloudinary response missing 'secure_url'")
 
         # Save metadata to MongoDB
-        save_image_data(image_id, prediction, confidence, image_url)
+        if save_metadata:
+            save_image_data(image_id, prediction, confidence, image_url)
 
         print(f"[✓] Image uploaded: {image_url}")
         return True, "Image uploaded successfully", image_url
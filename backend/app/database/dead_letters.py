@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo.errors import CollectionInvalid
+
+from app.database.mongodb import db
+
+logger = logging.getLogger(__name__)
+
+# Capped collection: the oldest rejects are overwritten, it never grows
+DEAD_LETTER_BYTES = 16 * 1024 * 1024
+PREVIEW_BYTES = 1024
+
+
+def init_dead_letter_collection():
+    try:
+        db.create_collection("dead_letters", capped=True, size=DEAD_LETTER_BYTES)
+        return
+    except CollectionInvalid:
+        pass  # already exists
+    if db.dead_letters.options().get("capped"):
+        return
+    # Created uncapped (e.g. by an insert before this ran): cap it now
+    try:
+        db.command("convertToCapped", "dead_letters", size=DEAD_LETTER_BYTES)
+        logger.info("Converted dead_letters to a capped collection")
+    except Exception as e:
+        logger.warning(f"dead_letters is not capped and could not be converted: {e}")
+
+
+class DeadLetterStore:
+    """
+    Keep a sample of rejected MQTT messages for inspection.
+
+    At most `max_per_minute` rejects are written to Mongo, so a flood of bad
+    payloads cannot turn into a flood of writes; the rest are only counted
+    (see MessageDecoder.stats). Each record keeps the first PREVIEW_BYTES of
+    the payload.
+    """
+
+    def __init__(self, max_per_minute: int = 60):
+        self.max_per_minute = max_per_minute
+        self._lock = threading.Lock()
+        self._window = 0
+        self._written = 0
+        self.stats = {"stored": 0, "skipped": 0}
+
+    def _allow(self) -> bool:
+        window = int(time.monotonic() // 60)
+        with self._lock:
+            if window != self._window:
+                self._window, self._written = window, 0
+            if self._written >= self.max_per_minute:
+                self.stats["skipped"] += 1
+                return False
+            self._written += 1
+            return True
+
+    def record(self, topic: str, payload: bytes, reason: str, detail: str = "") -> bool:
+        if not self._allow():
+            return False
+        try:
+            db.dead_letters.insert_one(
+                {
+                    "topic": topic,
+                    "reason": reason,
+                    "detail": detail[:512],
+                    "size": len(payload),
+                    "payload": payload[:PREVIEW_BYTES].decode("utf-8", errors="replace"),
+                    "truncated": len(payload) > PREVIEW_BYTES,
+                    "received_at": datetime.now(),
+                }
+            )
+            self.stats["stored"] += 1
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store dead letter: {e}")
+            return False
+
+
+def get_dead_letters(limit: int = 50, reason: str = None) -> List[Dict]:
+    try:
+        query = {"reason": reason} if reason else {}
+        return list(
+            db.dead_letters.find(query, {"_id": 0}).sort("$natural", -1).limit(limit)
+        )
+    except Exception as e:
+        logger.error(f"Failed to retrieve dead letters: {e}")
+        return []
+
+
+dead_letters = DeadLetterStore()
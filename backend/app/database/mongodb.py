@@ -1,30 +1,15 @@
-import os
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Tuple
 
-from dotenv import load_dotenv
-from pymongo import MongoClient
+from app.container import DatabaseProxy
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
-
-
-# Init MongoDB client and database
-def init_mongo() -> MongoClient:
-    uri = os.getenv("MONGODB_URI")
-    db_name = os.getenv("DATABASE_NAME", "TomatoBuddy")
-    if not uri:
-        raise ValueError("MONGODB_URI is not set in the environment.")
-    client = MongoClient(uri)
-    return client[db_name]
-
-
-db = init_mongo()
+# Resolved lazily through app.container: importing this module never connects
+db = DatabaseProxy()
 
 
 # Helpers
@@ -41,14 +26,38 @@ def build_time_filter(
     return {"timestamp": filter_}
 
 
+def get_latest_marker(collection: str) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    Newest `_id` in a collection and its creation time (UTC).
+    Cheap change marker for HTTP caching: uses the default `_id` index.
+    """
+    try:
+        doc = db[collection].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        if not doc:
+            return None, None
+        oid = doc["_id"]
+        created = getattr(oid, "generation_time", None)
+        # bson's FixedOffset "UTC" is not datetime.timezone.utc, which
+        # email.utils.format_datetime(usegmt=True) insists on
+        return str(oid), created.astimezone(timezone.utc) if created else None
+    except Exception as e:
+        logger.error(f"Failed to read latest marker for {collection}: {e}")
+        return None, None
+
+
 # SAVE Functions
 def save_sensor_reading(
-    temperature: float,
-    humidity: float,
-    moisture: float = 0.0,
-    light: float = 0.0,
-    water_level: float = 0.0,
+    temperature: Optional[float] = None,
+    humidity: Optional[float] = None,
+    moisture: Optional[float] = None,
+    light: Optional[float] = None,
+    water_level: Optional[float] = None,
+    stats: Optional[Dict] = None,
+    sample_count: int = 1,
+    timestamp: Optional[datetime] = None,
 ) -> Tuple[bool, str]:
+    """Fields the device did not report (e.g. a failed DHT read) are stored
+    as null, which $avg/$min/$max and the hourly aggregates skip."""
     try:
         sensor_reading = {
             "temperature": temperature,
@@ -56,8 +65,12 @@ def save_sensor_reading(
             "moisture": moisture,
             "light": light,
             "water_level": water_level,
-            "timestamp": datetime.now(),
+            "sample_count": sample_count,
+            "timestamp": timestamp or datetime.now(),
         }
+        if stats:
+            # Per-field min/max when the reading summarises an edge window
+            sensor_reading["stats"] = stats
         db.sensor_readings.insert_one(sensor_reading)
         logger.info("Sensor reading saved.")
         return True, "Sensor reading saved successfully"
@@ -67,14 +80,17 @@ def save_sensor_reading(
 
 
 def save_command_execution(
-    command_type: str, success: bool, params: Optional[Dict] = None
+    command_type: str,
+    success: bool,
+    params: Optional[Dict] = None,
+    timestamp: Optional[datetime] = None,
 ) -> Tuple[bool, str]:
     try:
         execution = {
             "command_type": command_type,
             "success": success,
             "params": params or {},
-            "timestamp": datetime.now(),
+            "timestamp": timestamp or datetime.now(),
         }
         db.command_executions.insert_one(execution)
         logger.info("Command execution saved.")
@@ -85,7 +101,14 @@ def save_command_execution(
 
 
 def save_image_data(
-    image_id: str, prediction: str, confidence: float, image_url: str = ""
+    image_id: str,
+    prediction: str,
+    confidence: float,
+    image_url: str = "",
+    timestamp: Optional[datetime] = None,
+    model_versions: Optional[Dict] = None,
+    phash: Optional[str] = None,
+    duplicate_of: Optional[str] = None,
 ) -> Tuple[bool, str]:
     try:
         image_data = {
@@ -93,8 +116,15 @@ def save_image_data(
             "prediction": prediction,
             "confidence": confidence,
             "image_url": image_url,
-            "timestamp": datetime.now(),
+            "timestamp": timestamp or datetime.now(),
         }
+        if model_versions:
+            image_data["model_versions"] = model_versions
+        if phash:
+            image_data["phash"] = phash
+        if duplicate_of:
+            # Near-duplicate crop: prediction reused from this image_id
+            image_data["duplicate_of"] = duplicate_of
         db.image_data.insert_one(image_data)
         logger.info(f"Image data saved: {image_id}")
         return True, "Image data saved successfully"
@@ -109,6 +139,8 @@ def save_watering_event(
     moisture_before: float = 0.0,
     moisture_after: float = 0.0,
     success: bool = True,
+    duration: float = 0.0,
+    timestamp: Optional[datetime] = None,
 ) -> Tuple[bool, str]:
     try:
         event = {
@@ -117,7 +149,8 @@ def save_watering_event(
             "moisture_before": moisture_before,
             "moisture_after": moisture_after,
             "success": success,
-            "timestamp": datetime.now(),
+            "duration": duration,
+            "timestamp": timestamp or datetime.now(),
         }
         db.watering_history.insert_one(event)
         logger.info(f"Watering event saved: {amount}ml via {mode}")
@@ -129,7 +162,10 @@ def save_watering_event(
 
 # GET Functions
 def get_sensor_readings(
-    limit: int = 100, skip: int = 0, hours: Optional[int] = None
+    limit: int = 100,
+    skip: int = 0,
+    hours: Optional[int] = None,
+    projection: Optional[Dict] = None,
 ) -> List[Dict]:
     try:
         query = {}
@@ -137,7 +173,10 @@ def get_sensor_readings(
             threshold = datetime.now() - timedelta(hours=hours)
             query["timestamp"] = {"$gte": threshold}
         return list(
-            db.sensor_readings.find(query).sort("timestamp", -1).skip(skip).limit(limit)
+            db.sensor_readings.find(query, projection)
+            .sort("timestamp", -1)
+            .skip(skip)
+            .limit(limit)
         )
     except Exception as e:
         logger.error(f"Failed to retrieve sensor readings: {e}")
@@ -182,6 +221,7 @@ def get_image_data(
     prediction_filter: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    projection: Optional[Dict] = None,
 ) -> List[Dict]:
     try:
         query = {}
@@ -189,19 +229,34 @@ def get_image_data(
             query["prediction"] = prediction_filter
         query.update(build_time_filter(start_date, end_date))
         return list(
-            db.image_data.find(query).sort("timestamp", -1).skip(skip).limit(limit)
+            db.image_data.find(query, projection)
+            .sort("timestamp", -1)
+            .skip(skip)
+            .limit(limit)
         )
     except Exception as e:
         logger.error(f"Failed to retrieve image data: {e}")
         return []
 
 
+def get_image_url(image_id: str) -> Optional[str]:
+    try:
+        doc = db.image_data.find_one(
+            {"image_id": image_id}, {"image_url": 1}, sort=[("timestamp", -1)]
+        )
+        return doc.get("image_url") if doc else None
+    except Exception as e:
+        logger.error(f"Failed to retrieve image url: {e}")
+        return None
+
+
 def get_watering_history(
     limit: int = 50,
     skip: int = 0,
     mode_filter: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    projection: Optional[Dict] = None,
 ) -> List[Dict]:
     try:
         query = {}
@@ -209,7 +264,7 @@ def get_watering_history(
             query["mode"] = mode_filter
         query.update(build_time_filter(start_date, end_date))
         return list(
-            db.watering_history.find(query)
+            db.watering_history.find(query, projection)
             .sort("timestamp", -1)
             .skip(skip)
             .limit(limit)
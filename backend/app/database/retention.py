@@ -0,0 +1,374 @@
+import asyncio
+import gzip
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+import orjson
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import get_config
+from app.database.mongodb import db
+from app.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet archives are optional
+    pa = None
+
+# Readings do not carry a device id yet; everything comes from the one Pi
+DEFAULT_DEVICE = "pizero2w"
+SENSOR_FIELDS = ("temperature", "humidity", "moisture", "light", "water_level")
+
+
+@dataclass
+class RetentionTier:
+    """
+    Raw documents older than `raw_days` are archived to disk and deleted.
+    With `hourly` set, hourly min/mean/max aggregates are merged into
+    `sensor_hourly` before the raw documents go. `raw_days <= 0` disables
+    the tier.
+    """
+
+    collection: str
+    raw_days: int
+    hourly: bool = False
+
+
+def retention_tiers() -> List[RetentionTier]:
+    config = get_config()
+    return [
+        RetentionTier("sensor_readings", config.sensor_raw_retention_days, hourly=True),
+        RetentionTier("command_executions", config.command_retention_days),
+        RetentionTier("image_data", config.image_retention_days),
+    ]
+
+
+# Progress of the current / last compaction run, served by /api/retention/status
+compaction_status: Dict = {
+    "state": "idle",
+    "collection": None,
+    "day": None,
+    "days_done": 0,
+    "days_total": 0,
+    "archived": 0,
+    "deleted": 0,
+    "hourly_upserts": 0,
+    "last_started": None,
+    "last_finished": None,
+    "last_duration": None,
+    "last_error": None,
+    "runs": 0,
+}
+_run_lock = threading.Lock()
+
+
+def init_retention_indexes():
+    # Range scans and deletes by day need a timestamp index on every tier
+    for tier in retention_tiers():
+        db[tier.collection].create_index([("timestamp", ASCENDING)])
+    db.sensor_hourly.create_index([("device_id", ASCENDING), ("hour", ASCENDING)], unique=True)
+
+
+# -------------------- Archive files --------------------
+def archive_path(collection: str, device_id: str, day: str) -> str:
+    config = get_config()
+    extension = "parquet" if config.archive_format == "parquet" else "jsonl.gz"
+    return os.path.join(config.archive_dir, collection, f"device={device_id}", f"{day}.{extension}")
+
+
+def _read_archive(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    if path.endswith(".parquet"):
+        return pq.read_table(path).to_pylist()
+    with gzip.open(path, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+def _to_record(doc: Dict) -> Dict:
+    record = dict(doc)
+    record["_id"] = str(record["_id"])
+    return record
+
+
+def _parquet_table(rows: List[Dict]):
+    """
+    One column per key found in any row (Table.from_pylist only looks at the
+    first row and silently drops the rest). Nested values such as stats,
+    params or model_versions vary in shape from row to row and an empty
+    struct cannot be written, so those columns hold JSON text.
+    """
+    names: Dict[str, None] = {}
+    for row in rows:
+        names.update(dict.fromkeys(row))
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if any(isinstance(value, (dict, list)) for value in values):
+            # Rows merged back from an earlier archive are already JSON text
+            values = [
+                value if value is None or isinstance(value, str) else dumps(value).decode()
+                for value in values
+            ]
+        columns[name] = values
+    return pa.table(columns)
+
+
+def write_archive(path: str, docs: Iterable[Dict]) -> int:
+    """
+    Write one day partition, merged with whatever an interrupted earlier run
+    already archived (by `_id`), via a temp file and an atomic rename.
+    """
+    records = {record["_id"]: record for record in _read_archive(path)}
+    for doc in docs:
+        record = _to_record(doc)
+        records[record["_id"]] = record
+    rows = sorted(records.values(), key=lambda r: str(r.get("timestamp", "")))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    if path.endswith(".parquet"):
+        pq.write_table(_parquet_table(rows), tmp_path, compression="zstd")
+    else:
+        with gzip.open(tmp_path, "wb") as f:
+            for row in rows:
+                f.write(dumps(row) + b"\n")
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+# -------------------- Hourly aggregates --------------------
+def tag_hourly_batch(collection: str, docs: List[Dict]) -> List[Dict]:
+    """
+    Stamp raw documents not yet folded into sensor_hourly with a new batch id.
+
+    The id is stored on the raw documents before the aggregates are written,
+    so a run interrupted after the upsert regroups them under the same id
+    and the guarded upsert in hourly_aggregates does not count them twice.
+    """
+    untagged = [doc["_id"] for doc in docs if "hourly_batch" not in doc]
+    if untagged:
+        batch = str(ObjectId())
+        db[collection].update_many(
+            {"_id": {"$in": untagged}, "hourly_batch": {"$exists": False}},
+            {"$set": {"hourly_batch": batch}},
+        )
+        for doc in docs:
+            doc.setdefault("hourly_batch", batch)
+    return docs
+
+
+def _merge_field(field: str, lo: float, total: float, hi: float, n: int) -> Dict:
+    # Hourly documents written before sum/n were stored only have mean/count
+    prev_n = {"$ifNull": [f"${field}.n", {"$ifNull": ["$count", 0]}]}
+    prev_sum = {"$ifNull": [f"${field}.sum", {"$multiply": [{"$ifNull": [f"${field}.mean", 0]}, prev_n]}]}
+    return {
+        f"{field}.min": {"$min": [f"${field}.min", lo]},
+        f"{field}.max": {"$max": [f"${field}.max", hi]},
+        f"{field}.sum": {"$add": [prev_sum, total]},
+        f"{field}.n": {"$add": [prev_n, n]},
+    }
+
+
+def hourly_aggregates(docs: Iterable[Dict], device_id: str) -> List[UpdateOne]:
+    """
+    min/mean/max per sensor field per hour, merged into what sensor_hourly
+    already holds (late readings can arrive after their hour was compacted).
+
+    Edge window summaries count with their `sample_count` and their own
+    min/max. Each op is guarded by the documents' `hourly_batch`, so it
+    applies at most once.
+    """
+    buckets: Dict[tuple, Dict] = {}
+    for doc in docs:
+        hour = doc["timestamp"].replace(minute=0, second=0, microsecond=0)
+        bucket = buckets.setdefault((hour, doc["hourly_batch"]), {"count": 0, "fields": {}})
+        weight = int(doc.get("sample_count") or 1)
+        stats = doc.get("stats") or {}
+        bucket["count"] += weight
+        for field in SENSOR_FIELDS:
+            value = doc.get(field)
+            if not isinstance(value, (int, float)):
+                continue
+            bounds = stats.get(field) or {}
+            lo, hi = bounds.get("min", value), bounds.get("max", value)
+            acc = bucket["fields"].setdefault(field, [lo, 0.0, hi, 0])
+            acc[0] = min(acc[0], lo)
+            acc[1] += value * weight
+            acc[2] = max(acc[2], hi)
+            acc[3] += weight
+
+    ops = []
+    for (hour, batch), bucket in buckets.items():
+        merged = {"count": {"$add": [{"$ifNull": ["$count", 0]}, bucket["count"]]}}
+        means = {}
+        for field, acc in bucket["fields"].items():
+            merged.update(_merge_field(field, *acc))
+            means[f"{field}.mean"] = {
+                "$round": [{"$divide": [f"${field}.sum", f"${field}.n"]}, 3]
+            }
+        merged["batches"] = {"$concatArrays": [{"$ifNull": ["$batches", []]}, [batch]]}
+        ops.append(
+            UpdateOne(
+                {"device_id": device_id, "hour": hour, "batches": {"$ne": batch}},
+                [{"$set": merged}, {"$set": means}] if means else [{"$set": merged}],
+                upsert=True,
+            )
+        )
+    return ops
+
+
+def apply_hourly(ops: List[UpdateOne]) -> int:
+    """Write hourly upserts; returns how many were applied"""
+    try:
+        result = db.sensor_hourly.bulk_write(ops, ordered=False)
+        return result.upserted_count + result.modified_count
+    except BulkWriteError as e:
+        # A batch already folded in matches no document, so its upsert hits
+        # the unique (device_id, hour) index: nothing to do for it
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        return len(ops) - len(errors)
+
+
+# -------------------- Compaction --------------------
+def _expired_days(collection: str, cutoff: datetime) -> List[datetime]:
+    oldest = db[collection].find_one(
+        {"timestamp": {"$lt": cutoff}}, {"timestamp": 1}, sort=[("timestamp", ASCENDING)]
+    )
+    if not oldest:
+        return []
+    day = oldest["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0)
+    days = []
+    while day < cutoff:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def compact_day(tier: RetentionTier, day: datetime, cutoff: datetime) -> Dict:
+    """
+    Archive, aggregate and delete one day of one collection.
+
+    The archive is written before anything is deleted and every step is
+    idempotent, so a run killed half way is simply redone next time.
+    """
+    end = min(day + timedelta(days=1), cutoff)
+    query = {"timestamp": {"$gte": day, "$lt": end}}
+    docs = list(db[tier.collection].find(query))
+    if not docs:
+        return {"archived": 0, "deleted": 0, "hourly_upserts": 0}
+
+    by_device: Dict[str, List[Dict]] = {}
+    for doc in docs:
+        by_device.setdefault(doc.get("device_id", DEFAULT_DEVICE), []).append(doc)
+
+    hourly_upserts = 0
+    for device_id, device_docs in by_device.items():
+        if tier.hourly:
+            tag_hourly_batch(tier.collection, device_docs)
+        write_archive(archive_path(tier.collection, device_id, day.strftime("%Y-%m-%d")), device_docs)
+        if tier.hourly:
+            ops = hourly_aggregates(device_docs, device_id)
+            if ops:
+                hourly_upserts += apply_hourly(ops)
+
+    # Only delete what was archived; readings arriving meanwhile are left alone
+    result = db[tier.collection].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+    return {"archived": len(docs), "deleted": result.deleted_count, "hourly_upserts": hourly_upserts}
+
+
+def run_compaction(on_change: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    One pass over every retention tier. `on_change(collection)` is called
+    after a collection lost documents (used to invalidate response caches).
+    """
+    if get_config().archive_format == "parquet" and pa is None:
+        raise RuntimeError("ARCHIVE_FORMAT=parquet needs pyarrow")
+    if not _run_lock.acquire(blocking=False):
+        logger.info("Compaction already running, skipped")
+        return dict(compaction_status)
+
+    status = compaction_status
+    started = time.time()
+    status.update(
+        state="running", archived=0, deleted=0, hourly_upserts=0, days_done=0,
+        last_started=datetime.now(), last_error=None,
+    )
+    try:
+        for tier in retention_tiers():
+            if tier.raw_days <= 0:
+                continue
+            cutoff = (datetime.now() - timedelta(days=tier.raw_days)).replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+            days = _expired_days(tier.collection, cutoff)
+            status.update(collection=tier.collection, days_total=status["days_done"] + len(days))
+            deleted = 0
+            for day in days:
+                status["day"] = day.strftime("%Y-%m-%d")
+                counts = compact_day(tier, day, cutoff)
+                for key, value in counts.items():
+                    status[key] += value
+                deleted += counts["deleted"]
+                status["days_done"] += 1
+            if deleted:
+                logger.info(f"Compacted {deleted} documents from {tier.collection}")
+                if on_change:
+                    on_change(tier.collection)
+                    if tier.hourly:
+                        on_change("sensor_hourly")
+    except Exception as e:
+        status["last_error"] = str(e)
+        logger.error(f"Compaction failed: {e}")
+    finally:
+        status.update(
+            state="idle", collection=None, day=None, last_finished=datetime.now(),
+            last_duration=round(time.time() - started, 3), runs=status["runs"] + 1,
+        )
+        _run_lock.release()
+    return dict(status)
+
+
+async def compaction_loop(
+    on_change: Optional[Callable[[str], None]] = None,
+    interval_hours: Optional[float] = None,
+):
+    """Background task started by the FastAPI lifespan"""
+    interval_hours = interval_hours or get_config().compaction_interval_hours
+    while True:
+        try:
+            await asyncio.to_thread(run_compaction, on_change)
+        except Exception as e:
+            logger.error(f"Compaction job error: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+# GET Functions
+def get_sensor_hourly(
+    hours: int = 24 * 30, device_id: str = DEFAULT_DEVICE, limit: int = 1000
+) -> List[Dict]:
+    try:
+        threshold = datetime.now() - timedelta(hours=hours)
+        return list(
+            db.sensor_hourly.find(
+                {"device_id": device_id, "hour": {"$gte": threshold}},
+                {"_id": 0, "batches": 0},
+            )
+            .sort("hour", -1)
+            .limit(limit)
+        )
+    except Exception as e:
+        logger.error(f"Failed to retrieve hourly sensor aggregates: {e}")
+        return []
@@ -0,0 +1,85 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from PIL import Image
+
+
+def dhash(image_binary: bytes, size: int = 8) -> int:
+    """64-bit difference hash, same algorithm as the edge crop_dedup module"""
+    image = Image.open(io.BytesIO(image_binary)).convert("L")
+    small = image.resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def parse_phash(value) -> Optional[int]:
+    try:
+        return int(value, 16) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RecentImages:
+    """
+    Bounded LRU of recently uploaded images keyed by image_id.
+
+    Used on inference ingest to skip re-uploading near-duplicate crops from
+    devices without edge dedup, and to resolve the image URL of a
+    `duplicate_of` reference without a database round trip.
+
+    A match must have the same prediction and be younger than `max_age`
+    seconds, kept well below the edge CropCache max_age (24 h) so a leaf
+    re-sent for a fresh diagnosis is never mapped to an old image.
+    """
+
+    def __init__(self, max_entries: int = 512, max_distance: int = 4, max_age: float = 3600):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def remember(
+        self, image_id: str, phash: Optional[int], image_url: str, prediction: Optional[str] = None
+    ):
+        with self._lock:
+            self._entries[image_id] = {
+                "phash": phash,
+                "image_url": image_url,
+                "prediction": prediction,
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(image_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def url_for(self, image_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(image_id)
+            return entry["image_url"] if entry else None
+
+    def find_similar(self, phash: int, prediction: Optional[str] = None) -> Optional[Dict]:
+        """Most recent fresh entry with the same prediction within max_distance bits of `phash`"""
+        now = time.monotonic()
+        with self._lock:
+            for image_id in reversed(self._entries):
+                entry = self._entries[image_id]
+                if entry["phash"] is None or entry["prediction"] != prediction:
+                    continue
+                if now - entry["stored_at"] > self.max_age:
+                    continue
+                if bin(entry["phash"] ^ phash).count("1") <= self.max_distance:
+                    self._entries.move_to_end(image_id)
+                    return {"image_id": image_id, **entry}
+        return None
+
+
+recent_images = RecentImages()
@@ -1,35 +1,62 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-import os
 
-# from app.mqtt_client import start_mqtt   # Tạm thời comment MQTT
-from app.routers import commands, data, settings
+from app.routers import analytics, commands, data, health, ingest, retention, settings, traces
+from app.config import get_config
+from app.container import container
 from app.database import init_database
+from app.database.retention import compaction_loop
+from app.mqtt_client import start_mqtt
+from app.response_cache import response_cache
+from app.tracing import configure_tracing, tracer
 
 # Setup logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Get allowed origins from env (default to '*')
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+ALLOWED_ORIGINS = get_config().allowed_origins
+
+
+def initialize_database():
+    # Runs off the event loop so an unreachable Mongo never delays startup;
+    # /health/ready reports the outcome
+    try:
+        init_database()
+        container.status["database"] = "ready"
+    except Exception as e:
+        container.status["database"] = f"error: {e}"
+        logger.error(f"Database initialization failed: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("FastAPI is starting...")
-    init_database()
+    configure_tracing(get_config())
+    tracer.start()
+    init_task = asyncio.create_task(asyncio.to_thread(initialize_database))
 
-    # try:
-    #     start_mqtt()
-    #     logger.info("MQTT connection established.")
-    # except Exception as e:
-    #     logger.warning(f"MQTT connection failed: {e}")
-    #     logger.info("Running without MQTT functionality")
+    # Non-blocking: the MQTT loop thread keeps retrying until the broker answers
+    if get_config().mqtt_enabled:
+        start_mqtt()
+    else:
+        logger.info("MQTT disabled (MQTT_ENABLED=0), running without device traffic")
+
+    # Archive + compact old raw data in the background (see /api/retention/status)
+    compaction_task = asyncio.create_task(compaction_loop(response_cache.invalidate))
 
     yield
 
+    compaction_task.cancel()
+    init_task.cancel()
+    # A compaction pass already in its worker thread finishes its current step
+    await asyncio.gather(compaction_task, init_task, return_exceptions=True)
+    tracer.stop()
+    container.close()
+
 
 app = FastAPI(
     title="TomatoBuddy API",
@@ -51,6 +78,11 @@ app.add_middleware(
 app.include_router(commands.router)
 app.include_router(data.router)
 app.include_router(settings.router)
+app.include_router(analytics.router)
+app.include_router(retention.router)
+app.include_router(traces.router)
+app.include_router(ingest.router)
+app.include_router(health.router)
 
 @app.get("/")
 async def root():
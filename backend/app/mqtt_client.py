@@ -1,92 +1,196 @@
 import paho.mqtt.client as mqtt
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 import base64
-import time
-import time
 
 from app.database.mongodb import (
     save_sensor_reading,
     save_command_execution,
     save_image_data,
+    save_watering_event,
+    get_image_url,
+    get_settings,
 )
 from app.database.cloudinary import upload_image
+from app.database.analytics import record_inference
+from app.response_cache import response_cache
+from app.image_dedup import dhash, parse_phash, recent_images
+from app.config import get_config
+from app.container import container
+from app.database.dead_letters import dead_letters
+from app.mqtt_messages import (
+    CommandAckMessage,
+    FieldSummary,
+    InferenceMessage,
+    MessageDecoder,
+    RejectedMessage,
+    SensorMessage,
+    WateringMessage,
+)
+from app.tracing import profile_requests, profiled, tracer
 
-# MQTT config
-BROKER = "10.211.222.46"
-PORT = 1883
+# Broker address comes from app.config (MQTT_BROKER / MQTT_PORT); the client
+# itself is created lazily by app.container
 
 # Topics
 SENSOR_TOPIC = "pizero2w/sensorreading"
 INFERENCE_TOPIC = "pizero2w/inference"
+WATERING_TOPIC = "pizero2w/watering"
 ACK_TOPIC_PREFIX = "pizero2w/ack/"
 COMMAND_TOPIC = "pizero2w/commands"
 SETTINGS_TOPIC = "pizero2w/settings"
 
-client = mqtt.Client()
+# Inbound schema + size limit per topic, checked before anything is parsed
+decoder = MessageDecoder(
+    {
+        SENSOR_TOPIC: (SensorMessage, 4 * 1024),
+        INFERENCE_TOPIC: (InferenceMessage, 128 * 1024),
+        WATERING_TOPIC: (WateringMessage, 4 * 1024),
+        ACK_TOPIC_PREFIX + "+": (CommandAckMessage, 4 * 1024),
+    }
+)
 
 
 # -------------------- MQTT CALLBACKS --------------------
 
 def on_connect(client, userdata, flags, rc):
     print("Connected to MQTT broker with result code", rc)
-    client.subscribe([(SENSOR_TOPIC, 0), (INFERENCE_TOPIC, 0), (ACK_TOPIC_PREFIX + "+", 0)])
+    client.subscribe(
+        [
+            (SENSOR_TOPIC, 0),
+            (INFERENCE_TOPIC, 0),
+            (WATERING_TOPIC, 0),
+            (ACK_TOPIC_PREFIX + "+", 0),
+        ]
+    )
+    # Runs on the MQTT thread; the settings read is a single find_one
+    publish_stored_settings()
+
+
+def on_disconnect(client, userdata, rc):
+    if rc != 0:
+        print(f"[MQTT] Connection lost (rc={rc}), reconnecting...")
 
 
 def on_message(client, userdata, msg):
     topic = msg.topic
     try:
-        payload = msg.payload.decode()
-        data = json.loads(payload)
-        print(f"Received message on topic: {topic}")
-
-        if topic == SENSOR_TOPIC:
-            handle_sensor_data(data)
-        elif topic == INFERENCE_TOPIC:
-            handle_inference_data(data)
-        elif topic.startswith(ACK_TOPIC_PREFIX):
-            command_type = topic[len(ACK_TOPIC_PREFIX):]
-            handle_command_ack(command_type, data)
-        else:
-            print(f"Unknown topic: {topic}")
-    except json.JSONDecodeError:
-        print(f"Invalid JSON in message: {msg.payload}")
+        message = decoder.decode(topic, msg.payload)
+    except RejectedMessage as e:
+        print(f"Rejected message on {topic}: {e}")
+        dead_letters.record(topic, msg.payload, e.reason, e.detail)
+        return
+
+    print(f"Received message on topic: {topic}")
+    try:
+        # Continue the edge's trace (if sampled); profile when armed via the API
+        with (
+            tracer.span("backend.dispatch", parent=message.traceparent, topic=topic),
+            profiled("ingest", profile_requests.take(), get_config().profile_dir),
+        ):
+            dispatch_message(topic, message)
     except Exception as e:
         print(f"Error processing message: {str(e)}")
 
 
+def dispatch_message(topic: str, message):
+    if topic == SENSOR_TOPIC:
+        handle_sensor_data(message)
+    elif topic == INFERENCE_TOPIC:
+        handle_inference_data(message)
+    elif topic == WATERING_TOPIC:
+        handle_watering_data(message)
+    elif topic.startswith(ACK_TOPIC_PREFIX):
+        command_type = topic[len(ACK_TOPIC_PREFIX):]
+        handle_command_ack(command_type, message)
+    else:
+        print(f"Unknown topic: {topic}")
+
+
 # -------------------- MESSAGE HANDLERS --------------------
 
-def handle_sensor_data(data: dict):
+# Buffered messages can arrive hours late; anything further ahead than this
+# is treated as a bad device clock
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def parse_device_timestamp(value) -> Optional[datetime]:
+    """Parse the ISO timestamp the edge put in a payload.
+
+    Returns None (i.e. use the receive time) when it is missing, invalid or
+    in the future.
+    """
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    if ts > datetime.now() + MAX_CLOCK_SKEW:
+        return None
+    return ts
+
+
+# Edge payload key -> sensor_readings field
+SENSOR_FIELDS = {
+    "temp": "temperature",
+    "humidity": "humidity",
+    "moisture": "moisture",
+    "light": "light",
+    "water_level": "water_level",
+}
+
+
+def handle_sensor_data(message: SensorMessage):
     try:
-        # soil = int(data.get("soil", 0))
-        # voltage = float(data.get("voltage", 0.0))
-        temp = float(data.get("temp", 0.0))
-        humidity = float(data.get("humidity", 0.0))
-        moisture = float(data.get("moisture", 0.0))
-        # light = float(data.get("light", 0.0))
-        # water_level = float(data.get("water_level", 0.0))
-
-        print(f"Temp: {temp}°C | Humidity: {humidity}% | Moisture: {moisture}%")
-        # print(f"Temp: {temp}°C | Humidity: {humidity}% | Moisture: {moisture}% | Light: {light} | Water: {water_level}ml")
-
-        save_sensor_reading(
-            temperature=temp,
-            humidity=humidity,
-            moisture=moisture,
-            light=light,
-            water_level=water_level,
+        values = {}
+        stats = None
+        sample_count = 1
+        if message.aggregate:
+            # Window summary from the edge: the mean is stored as the reading,
+            # min/max are kept alongside it
+            stats = {}
+            sample_count = message.count
+        for key, field in SENSOR_FIELDS.items():
+            value = getattr(message, key)
+            if isinstance(value, FieldSummary):
+                values[field] = value.mean
+                stats[field] = {"min": value.min, "max": value.max}
+            elif value is not None:
+                values[field] = value
+
+        if not values:
+            print("Sensor message without any readings, skipped")
+            return
+        print(
+            f"Temp: {values.get('temperature')}°C | Humidity: {values.get('humidity')}% | "
+            f"Moisture: {values.get('moisture')}% | samples: {sample_count}"
         )
+
+        # Missing fields stay None (stored as null), never 0.0
+        with tracer.span("mongo.write", collection="sensor_readings"):
+            save_sensor_reading(
+                **values,
+                stats=stats,
+                sample_count=sample_count,
+                timestamp=parse_device_timestamp(message.window_end or message.timestamp),
+            )
+        response_cache.invalidate("sensor_readings")
     except Exception as e:
         print(f"Error handling sensor data: {str(e)}")
 
 
-def handle_inference_data(data: dict):
+def handle_inference_data(message: InferenceMessage):
     try:
-        image_id = data.get("image_id", "")
-        prediction = data.get("prediction", "")
-        confidence = float(data.get("confidence", 0.0))
-        image_data = data.get("image_data", "")  # base64
+        image_id = message.image_id
+        prediction = message.prediction
+        confidence = message.confidence
+        image_data = message.image_data  # base64
+        duplicate_of = message.duplicate_of
+        phash = parse_phash(message.phash)
 
         print(f"Inference result: '{prediction}' ({confidence:.6f}) for image {image_id}")
 
@@ -94,56 +198,114 @@ def handle_inference_data(data: dict):
         if image_data:
             try:
                 image_binary = base64.b64decode(image_data)
-                success, message, image_url = upload_image(image_binary, prediction, confidence)
-                if not success:
-                    print(f"Image upload failed: {message}")
+                similar = None
+                if phash is None:
+                    # No edge dedup on this device: check recent uploads here.
+                    # With a phash the edge already decided this crop is new
+                    # (or due for a re-check), so it is always uploaded.
+                    phash = dhash(image_binary)
+                    similar = recent_images.find_similar(phash, prediction)
+                if similar:
+                    # Near-duplicate of a recent upload: reuse its URL
+                    duplicate_of = similar["image_id"]
+                    image_url = similar["image_url"]
+                else:
+                    with tracer.span("upload", bytes=len(image_binary)):
+                        success, upload_message, image_url = upload_image(
+                            image_binary, prediction, confidence, save_metadata=False
+                        )
+                    if not success:
+                        print(f"Image upload failed: {upload_message}")
             except Exception as e:
                 print(f"Error decoding image: {str(e)}")
+        elif duplicate_of:
+            # The edge skipped the payload; point at the original crop's image
+            image_url = recent_images.url_for(duplicate_of) or get_image_url(duplicate_of)
+
+        if image_url and not duplicate_of:
+            recent_images.remember(image_id, phash, image_url, prediction)
 
         # Always save inference metadata
-        save_image_data(image_id, prediction, confidence, image_url)
+        timestamp = parse_device_timestamp(message.timestamp)
+        with tracer.span("mongo.write", collection="image_data"):
+            saved, _ = save_image_data(
+                image_id,
+                prediction,
+                confidence,
+                image_url,
+                timestamp=timestamp,
+                model_versions=message.model_versions,
+                phash=f"{phash:016x}" if phash is not None else None,
+                duplicate_of=duplicate_of,
+            )
+            if saved:
+                record_inference(
+                    prediction, confidence, timestamp, bool(duplicate_of), image_id=image_id
+                )
+        if saved:
+            response_cache.invalidate("image_data")
     except Exception as e:
         print(f"Error handling inference data: {str(e)}")
 
 
-def handle_command_ack(command_type: str, data: dict):
+def handle_watering_data(message: WateringMessage):
+    """One message per finished watering session on the edge"""
     try:
-        success = data.get("success", False)
-        status = "success" if success else "failed"
+        print(f"Watering session: {message.amount}ml via {message.mode}")
+        save_watering_event(
+            amount=message.amount,
+            mode=message.mode,
+            moisture_before=message.moisture_before or 0.0,
+            moisture_after=message.moisture_after or 0.0,
+            success=message.success,
+            duration=message.duration,
+            timestamp=parse_device_timestamp(message.timestamp),
+        )
+        response_cache.invalidate("watering_history")
+    except Exception as e:
+        print(f"Error handling watering data: {str(e)}")
+
+
+def handle_command_ack(command_type: str, message: CommandAckMessage):
+    try:
+        status = "success" if message.success else "failed"
         print(f"🛠️ Command '{command_type}' execution status: {status}")
-        save_command_execution(command_type, success)
+        save_command_execution(
+            command_type,
+            message.success,
+            timestamp=parse_device_timestamp(message.timestamp),
+        )
     except Exception as e:
         print(f"Error handling command ack: {str(e)}")
 
 
 # -------------------- MQTT UTILITIES --------------------
 
-def start_mqtt(max_retries: int = 9999, retry_delay: int = 5) -> bool:
-    """Connect and start MQTT loop in background, with retry if fails"""
+def start_mqtt():
+    """
+    Connect in the background and start the MQTT loop thread.
+
+    Never blocks: paho's loop thread keeps retrying (1-60 s backoff) until
+    the broker answers and reconnects after drops. Stopped by
+    container.close() on shutdown.
+    """
+    client = container.mqtt
     client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
     client.on_message = on_message
+    config = get_config()
+
+    print(f"[MQTT] Connecting to broker {config.mqtt_broker}:{config.mqtt_port} ...")
+    client.reconnect_delay_set(min_delay=1, max_delay=60)
+    client.connect_async(config.mqtt_broker, config.mqtt_port, keepalive=60)
+    client.loop_start()
+    print("[MQTT] MQTT client started")
 
-    for attempt in range(1, max_retries + 1):
-        try:
-            print(f"[MQTT] Attempt {attempt}: Connecting to broker {BROKER}:{PORT} ...")
-            client.connect(BROKER, PORT, keepalive=60)
-            client.loop_start()
-            print("[MQTT] MQTT client started")
-            return True
-        except Exception as e:
-            print(f"[MQTT] Connection failed: {e}")
-            if attempt < max_retries:
-                print(f"[MQTT] Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            else:
-                print("[MQTT] Max retries reached. MQTT connection failed")
-                return False
-
-
-def publish_message(topic: str, payload: dict) -> bool:
+
+def publish_message(topic: str, payload: dict, qos: int = 0, retain: bool = False) -> bool:
     """Publish payload (as JSON) to topic"""
     try:
-        result = client.publish(topic, json.dumps(payload))
+        result = container.mqtt.publish(topic, json.dumps(payload), qos=qos, retain=retain)
         return result.rc == mqtt.MQTT_ERR_SUCCESS
     except Exception as e:
         print(f"Error publishing message: {str(e)}")
@@ -152,21 +314,25 @@ def publish_message(topic: str, payload: dict) -> bool:
 
 # -------------------- COMMAND WRAPPERS --------------------
 
-def send_command(command_name: str, params: dict = {}) -> bool:
+def send_command(command_name: str, params: dict = {}, trace: Optional[bool] = None) -> bool:
+    """`trace=True` forces this command to be traced end to end, None samples it"""
     command = {
         "command": command_name,
         "params": params,
         "timestamp": datetime.now().isoformat(),
     }
-    return publish_message(COMMAND_TOPIC, command)
+    with tracer.span("command.publish", root=True, sampled=trace or None, command=command_name):
+        tracer.inject(command)
+        return publish_message(COMMAND_TOPIC, command)
 
 
 def send_water_command(amount: int = 300) -> bool:
     return send_command("water", {"amount": amount})
 
 
-def send_capture_command() -> bool:
-    return send_command("capture")
+def send_capture_command(trace: Optional[bool] = None, profile: bool = False) -> bool:
+    # profile: the device writes a cProfile/pyinstrument dump of this capture
+    return send_command("capture", {"profile": True} if profile else {}, trace=trace)
 
 
 def send_chirp_command(duration: int = 3) -> bool:
@@ -175,7 +341,12 @@ def send_chirp_command(duration: int = 3) -> bool:
 
 #- -------------------- SETTINGS --------------------
 def send_settings_update(settings):
-    """Send settings update to edge AI via MQTT"""
+    """
+    Send settings update to edge AI via MQTT
+
+    Published retained, so the broker hands the latest settings to the
+    device whenever it (re)subscribes, e.g. after a reboot.
+    """
     payload = {
         "settings": {
             "image_capture_interval": settings["image_capture_interval"],
@@ -186,5 +357,12 @@ def send_settings_update(settings):
         },
         "timestamp": datetime.now().isoformat()
     }
-    return publish_message(SETTINGS_TOPIC, payload)
+    return publish_message(SETTINGS_TOPIC, payload, qos=1, retain=True)
 
+
+def publish_stored_settings():
+    """Re-publish the saved settings (retained) in case the broker lost them"""
+    try:
+        send_settings_update(get_settings())
+    except Exception as e:
+        print(f"[MQTT] Could not publish stored settings: {e}")
@@ -0,0 +1,162 @@
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+
+# Typed schemas for every inbound MQTT topic.
+#
+# Payload bytes go straight to pydantic-core (`model_validate_json`), which
+# parses and validates in one pass in Rust: no json.loads dict, no per-field
+# float() calls, and malformed input fails fast with a structured reason.
+# Unknown keys are ignored so newer edge firmware stays compatible.
+
+
+class EdgeMessage(BaseModel):
+    model_config = ConfigDict(extra="ignore", allow_inf_nan=False, frozen=True)
+
+    timestamp: Optional[str] = Field(default=None, max_length=64)
+    traceparent: Optional[str] = Field(default=None, max_length=64)
+
+
+class FieldSummary(BaseModel):
+    model_config = ConfigDict(extra="ignore", allow_inf_nan=False, frozen=True)
+
+    min: float
+    mean: float
+    max: float
+
+
+SensorValue = Optional[Union[float, FieldSummary]]
+
+
+class SensorMessage(EdgeMessage):
+    """A single reading, or an edge window summary when `aggregate` is set"""
+
+    aggregate: bool = False
+    count: int = Field(default=1, ge=0, le=1_000_000)
+    window_start: Optional[str] = Field(default=None, max_length=64)
+    window_end: Optional[str] = Field(default=None, max_length=64)
+    temp: SensorValue = None
+    humidity: SensorValue = None
+    moisture: SensorValue = None
+    light: SensorValue = None
+    water_level: SensorValue = None
+
+    @model_validator(mode="after")
+    def check_shape(self):
+        expected = FieldSummary if self.aggregate else float
+        for name in ("temp", "humidity", "moisture", "light", "water_level"):
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, expected):
+                kind = "min/mean/max objects" if self.aggregate else "numbers"
+                raise ValueError(f"'{name}' must be {kind}")
+        return self
+
+
+class InferenceMessage(EdgeMessage):
+    image_id: str = Field(min_length=1, max_length=128)
+    prediction: str = Field(max_length=128)
+    confidence: float = Field(ge=0.0, le=1.0)
+    # base64 JPEG; the edge targets 24 KiB, i.e. ~32 KiB of base64
+    image_data: Optional[str] = Field(default=None, max_length=96 * 1024)
+    jpeg_quality: Optional[int] = Field(default=None, ge=1, le=100)
+    phash: Optional[str] = Field(default=None, pattern=r"^[0-9a-fA-F]{1,16}$")
+    duplicate_of: Optional[str] = Field(default=None, max_length=128)
+    model_versions: Optional[Dict[str, str]] = Field(default=None, max_length=16)
+
+
+class WateringMessage(EdgeMessage):
+    amount: float = Field(default=0.0, ge=0.0, le=100_000)
+    mode: str = Field(default="auto", max_length=32)
+    duration: float = Field(default=0.0, ge=0.0)
+    moisture_before: Optional[float] = None
+    moisture_after: Optional[float] = None
+    success: bool = True
+
+
+class CommandAckMessage(EdgeMessage):
+    # Handlers add their own details (e.g. scene_score), so extras are kept
+    model_config = ConfigDict(extra="allow", allow_inf_nan=False, frozen=True)
+
+    command: Optional[str] = Field(default=None, max_length=64)
+    success: bool = False
+    error: Optional[str] = Field(default=None, max_length=1024)
+    coalesced: int = Field(default=0, ge=0)
+    duration: Optional[float] = Field(default=None, ge=0.0)
+
+
+class RejectedMessage(Exception):
+    """Raised by MessageDecoder.decode; `reason` is a short counter key"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+        self.detail = detail
+
+
+UNKNOWN_TOPIC = "<unknown>"
+
+
+class MessageDecoder:
+    """
+    Topic -> (schema, max payload bytes). Topics ending in '+' match any
+    single-level suffix (e.g. ack topics per command).
+
+    The size limit is checked on the raw bytes before any parsing, so an
+    oversized or hostile payload costs one len() call.
+    """
+
+    def __init__(self, schemas: Dict[str, Tuple[Type[EdgeMessage], int]]):
+        self._exact = {t: (t, *s) for t, s in schemas.items() if not t.endswith("+")}
+        self._prefixes = [(t[:-1], (t, *s)) for t, s in schemas.items() if t.endswith("+")]
+        self._lock = threading.Lock()
+        # Counted per subscription pattern, not per raw topic, so the number
+        # of keys stays bounded whatever suffixes devices publish on
+        self.accepted: Counter = Counter()
+        self.rejected: Counter = Counter()  # (pattern, reason) -> count
+
+    def _schema_for(self, topic: str):
+        """-> (pattern, model, max_bytes), or None"""
+        schema = self._exact.get(topic)
+        if schema is not None:
+            return schema
+        for prefix, schema in self._prefixes:
+            suffix = topic[len(prefix):]
+            if topic.startswith(prefix) and suffix and "/" not in suffix and len(suffix) <= 64:
+                return schema
+        return None
+
+    def decode(self, topic: str, payload: bytes) -> EdgeMessage:
+        pattern = UNKNOWN_TOPIC
+        try:
+            schema = self._schema_for(topic)
+            if schema is None:
+                raise RejectedMessage("unknown_topic")
+            pattern, model, max_bytes = schema
+            if len(payload) > max_bytes:
+                raise RejectedMessage("too_large", f"{len(payload)} > {max_bytes} bytes")
+            try:
+                message = model.model_validate_json(payload)
+            except ValidationError as e:
+                error = e.errors(include_url=False, include_input=False)[0]
+                reason = "invalid_json" if error["type"] == "json_invalid" else "schema"
+                location = ".".join(str(part) for part in error["loc"])
+                raise RejectedMessage(reason, f"{location}: {error['msg']}".lstrip(": "))
+        except RejectedMessage as e:
+            with self._lock:
+                self.rejected[(pattern, e.reason)] += 1
+            raise
+        with self._lock:
+            self.accepted[pattern] += 1
+        return message
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "accepted": dict(self.accepted),
+                "rejected": [
+                    {"topic": topic, "reason": reason, "count": count}
+                    for (topic, reason), count in self.rejected.most_common()
+                ],
+            }
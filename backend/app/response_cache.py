@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict
+
+from fastapi import Request, Response
+
+from app.database.mongodb import get_latest_marker
+from app.serialization import dumps
+
+
+class ResponseCache:
+    """
+    Conditional-GET support and a bounded LRU of serialized responses.
+
+    The ETag of a response is derived from:
+      - the newest `_id` of the backing collection (ObjectIds grow with
+        insertion order, so this also catches late, back-dated inserts),
+      - a per-collection generation bumped by the ingest path,
+      - the request path and query string,
+      - a one-minute time bucket for endpoints with relative time windows.
+
+    A matching `If-None-Match` gets a 304 without touching the query. Bodies
+    are cached by ETag, so a changed collection can never serve a stale body.
+
+    `Last-Modified` / `If-Modified-Since` only have one-second resolution, so
+    a response whose data changed within the current second carries no
+    Last-Modified: a second write in the same second would otherwise be
+    hidden behind a 304. Such clients revalidate with the ETag or refetch.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[str, bytes]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._modified_at: Dict[str, datetime] = {}
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def invalidate(self, collection: str):
+        """Called by the ingest path after writing to `collection`"""
+        with self._lock:
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+            self._modified_at[collection] = datetime.now(timezone.utc)
+            for key in [k for k in self._bodies if k.startswith(collection + ":")]:
+                del self._bodies[key]
+
+    def _etag(self, request: Request, collection: str, marker, time_bucket) -> str:
+        with self._lock:
+            generation = self._generations.get(collection, 0)
+        raw = f"{collection}|{marker}|{generation}|{request.url.path}|{request.url.query}|{time_bucket}"
+        return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+    def _last_modified(self, collection: str, inserted_at, time_window: bool):
+        """Newest insert or ingest write, or None if unusable for If-Modified-Since"""
+        if time_window:
+            return None
+        with self._lock:
+            modified_at = self._modified_at.get(collection)
+        candidates = [t for t in (inserted_at, modified_at) if t is not None]
+        if not candidates:
+            return None
+        last_modified = max(candidates)
+        if last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+            return None  # still the current second: not a safe validator yet
+        return last_modified
+
+    @staticmethod
+    def _matches(request: Request, etag: str, last_modified) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None:
+            try:
+                return last_modified.replace(microsecond=0) <= parsedate_to_datetime(
+                    if_modified_since
+                )
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def respond(
+        self,
+        request: Request,
+        collection: str,
+        build: Callable[[], Any],
+        time_window: bool = False,
+        render: Callable[[Any], bytes] = dumps,
+        media_type: str = "application/json",
+    ) -> Response:
+        """Serve `render(build())` (JSON by default), or 304 if the client copy is current"""
+        marker, last_modified = get_latest_marker(collection)
+        time_bucket = int(time.time() // 60) if time_window else None
+        etag = self._etag(request, collection, marker, time_bucket)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        last_modified = self._last_modified(collection, last_modified, time_window)
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+        if self._matches(request, etag, last_modified):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        key = f"{collection}:{etag}"
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+        if body is None:
+            self.stats["misses"] += 1
+            body = render(build())
+            with self._lock:
+                self._bodies[key] = body
+                while len(self._bodies) > self.max_entries:
+                    self._bodies.popitem(last=False)
+        else:
+            self.stats["hits"] += 1
+
+        return Response(content=body, media_type=media_type, headers=headers)
+
+
+response_cache = ResponseCache()
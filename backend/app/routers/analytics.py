@@ -0,0 +1,58 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from app.database.analytics import (
+    get_disease_summary,
+    get_disease_daily,
+    get_new_disease_alerts,
+    rebuild_disease_stats,
+)
+
+from app.serialization import BSONJSONResponse
+
+router = APIRouter(
+    prefix="/api/analytics", tags=["analytics"], default_response_class=BSONJSONResponse
+)
+
+
+@router.get("/diseases/summary")
+async def disease_summary():
+    """
+    Season-wide disease prevalence
+
+    Per label: count, prevalence, mean confidence, confidence histogram
+    (10 buckets of 0.1), first and last seen. Served from pre-aggregated
+    counters, so the cost does not grow with the number of images.
+    """
+    return get_disease_summary()
+
+
+@router.get("/diseases/daily")
+async def disease_daily(
+    days: int = Query(30, ge=1, le=366),
+    label: Optional[str] = None,
+):
+    """
+    Per-day disease counters
+
+    - **days**: Number of days to include, counting today
+    - **label**: Only return this prediction label
+    """
+    return get_disease_daily(days, label)
+
+
+@router.get("/diseases/alerts")
+async def disease_alerts(days: int = Query(7, ge=1, le=90)):
+    """Diseases detected for the first time within the last X days"""
+    return get_new_disease_alerts(days)
+
+
+@router.post("/diseases/rebuild")
+async def rebuild_disease_analytics():
+    """Recompute the disease counters from all stored image data"""
+    try:
+        processed = await asyncio.to_thread(rebuild_disease_stats)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "processed": processed}
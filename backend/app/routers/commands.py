@@ -24,9 +24,14 @@ async def water_plants(command: WaterCommand):
 
 
 @router.post("/capture")
-async def capture_image():
-    """Send command to capture an image"""
-    success = send_capture_command()
+async def capture_image(trace: bool = False, profile: bool = False):
+    """
+    Send command to capture an image
+
+    - **trace**: Always trace this capture end to end (otherwise sampled)
+    - **profile**: Ask the device to write a profile of the capture
+    """
+    success = send_capture_command(trace=trace or None, profile=profile)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to send capture command")
     return {"success": True, "message": "Capture command sent"}
@@ -1,20 +1,91 @@
-from fastapi import APIRouter, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
+from app import columnar
 from app.database.mongodb import (
     get_sensor_readings,
     get_image_data,
     get_watering_history,
 )
+from app.database.cloudinary import rendition_urls
+from app.database.retention import get_sensor_hourly
+from app.response_cache import response_cache
+from app.serialization import BSONJSONResponse, build_projection
 
-router = APIRouter(prefix="/api/data", tags=["data"])
+router = APIRouter(
+    prefix="/api/data", tags=["data"], default_response_class=BSONJSONResponse
+)
+
+# All endpoints answer conditional GETs (ETag / If-None-Match, Last-Modified)
+# through response_cache; the ingest path invalidates it on every write.
+# Bodies are serialized by orjson in one pass, ObjectId included.
+
+# Internal bookkeeping fields left out of list responses unless asked for
+IMAGE_DEFAULT_EXCLUDE = {"phash": 0, "model_versions": 0}
+FIELDS_DOC = "Comma-separated fields to return (default: all public fields)"
+FORMAT_DOC = (
+    "rows (list of documents), columnar (one array per field) "
+    "or arrow (Arrow IPC stream, needs pyarrow)"
+)
+FORMAT_PATTERN = "^(rows|columnar|arrow)$"
+
+
+def respond_series(
+    request: Request,
+    collection: str,
+    fetch: Callable[[Optional[Dict]], List[Dict]],
+    schema: Dict[str, str],
+    fields: Optional[str],
+    format: str,
+    time_window: bool = False,
+):
+    """
+    Serve a time series either as rows or column-oriented.
+
+    Columnar bodies only project the schema columns from Mongo and skip
+    per-row keys, which makes chart payloads several times smaller.
+    """
+    if format == "rows":
+        projection = build_projection(fields)
+        return response_cache.respond(
+            request, collection, lambda: fetch(projection), time_window=time_window
+        )
+
+    if format == "arrow" and columnar.pa is None:
+        raise HTTPException(status_code=406, detail="Arrow format is not available")
+
+    schema = columnar.select_columns(schema, fields)
+    if not schema:
+        raise HTTPException(status_code=400, detail="No known columns in fields")
+
+    def build():
+        return columnar.build_columns(fetch(columnar.projection_for(schema)), schema)
+
+    if format == "arrow":
+        return response_cache.respond(
+            request,
+            collection,
+            build,
+            time_window=time_window,
+            render=lambda columns: columnar.arrow_ipc(columns, schema),
+            media_type=columnar.ARROW_MEDIA_TYPE,
+        )
+    return response_cache.respond(
+        request,
+        collection,
+        lambda: columnar.columnar_payload(build()),
+        time_window=time_window,
+    )
 
 
 @router.get("/sensors")
 async def sensor_readings(
+    request: Request,
     limit: int = Query(100, ge=1, le=1000),
     skip: int = Query(0, ge=0),
     hours: Optional[int] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DOC),
+    format: str = Query("rows", pattern=FORMAT_PATTERN, description=FORMAT_DOC),
 ):
     """
     Get the most recent sensor readings
@@ -22,27 +93,39 @@ async def sensor_readings(
     - **limit**: Maximum number of readings to return
     - **skip**: Number of readings to skip (for pagination)
     - **hours**: Filter readings from the last X hours
+    - **fields**: Only return these fields, e.g. `timestamp,temperature`
+    - **format**: `rows` (default), `columnar` or `arrow`
     """
-    data = get_sensor_readings(limit, skip, hours)
-    # Convert ObjectId to string for JSON serialization
-    for item in data:
-        item["_id"] = str(item["_id"])
-    return data
+
+    def fetch(projection):
+        return get_sensor_readings(limit, skip, hours, projection)
+
+    return respond_series(
+        request,
+        "sensor_readings",
+        fetch,
+        columnar.SENSOR_COLUMNS,
+        fields,
+        format,
+        time_window=hours is not None,
+    )
 
 
 @router.get("/sensors/latest")
-async def latest_sensor_reading():
+async def latest_sensor_reading(request: Request):
     """Get the most recent sensor reading"""
-    data = get_sensor_readings(limit=1)
-    if data:
-        # Convert ObjectId to string for JSON serialization
-        data[0]["_id"] = str(data[0]["_id"])
-        return data[0]
-    return {"error": "No sensor readings available"}
+
+    def build():
+        data = get_sensor_readings(limit=1)
+        if data:
+            return data[0]
+        return {"error": "No sensor readings available"}
+
+    return response_cache.respond(request, "sensor_readings", build)
 
 
 @router.get("/sensors/stats")
-async def sensor_statistics(days: int = Query(7, ge=1, le=30)):
+async def sensor_statistics(request: Request, days: int = Query(7, ge=1, le=30)):
     """
     Get statistics for sensor readings over the specified number of days
 
@@ -50,18 +133,45 @@ async def sensor_statistics(days: int = Query(7, ge=1, le=30)):
     """
     from app.database.mongodb import get_sensor_stats
 
-    return get_sensor_stats(days)
+    return response_cache.respond(
+        request, "sensor_readings", lambda: get_sensor_stats(days), time_window=True
+    )
+
+
+@router.get("/sensors/hourly")
+async def sensor_hourly(
+    request: Request,
+    hours: int = Query(24 * 30, ge=1, le=24 * 366),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Hourly min/mean/max aggregates, kept after raw readings are archived
+
+    - **hours**: Only return the last X hours
+    """
+    return response_cache.respond(
+        request,
+        "sensor_hourly",
+        lambda: get_sensor_hourly(hours, limit=limit),
+        time_window=True,
+    )
 
 
 @router.get("/images")
 async def images(
+    request: Request,
     limit: int = Query(20, ge=1, le=100),
     skip: int = Query(0, ge=0),
     prediction: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DOC),
 ):
-    """Get image data with optional filtering by prediction and date range"""
+    """
+    Get image data with optional filtering by prediction and date range
+
+    Each item has `image_urls` with `thumbnail`, `medium` and `original` renditions.
+    """
     # Convert string dates to datetime objects if provided
     start_datetime = None
     end_datetime = None
@@ -71,20 +181,31 @@ async def images(
     if end_date:
         end_datetime = datetime.fromisoformat(end_date)
 
-    data = get_image_data(limit, skip, prediction, start_datetime, end_datetime)
-    # Convert ObjectId to string for JSON serialization
-    for item in data:
-        item["_id"] = str(item["_id"])
-    return data
+    projection = build_projection(fields, IMAGE_DEFAULT_EXCLUDE)
+
+    def build():
+        data = get_image_data(
+            limit, skip, prediction, start_datetime, end_datetime, projection
+        )
+        for item in data:
+            # thumbnail / medium / original URLs so the gallery can load small tiles
+            if "image_url" in item:
+                item["image_urls"] = rendition_urls(item["image_url"])
+        return data
+
+    return response_cache.respond(request, "image_data", build)
 
 
 @router.get("/watering")
 async def watering_history(
+    request: Request,
     limit: int = Query(50, ge=1, le=500),
     skip: int = Query(0, ge=0),
     mode: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DOC),
+    format: str = Query("rows", pattern=FORMAT_PATTERN, description=FORMAT_DOC),
 ):
     """Get watering history with optional filtering by mode and date range"""
     # Convert string dates to datetime objects if provided
@@ -96,8 +217,11 @@ async def watering_history(
     if end_date:
         end_datetime = datetime.fromisoformat(end_date)
 
-    data = get_watering_history(limit, skip, mode, start_datetime, end_datetime)
-    # Convert ObjectId to string for JSON serialization
-    for item in data:
-        item["_id"] = str(item["_id"])
-    return data
+    def fetch(projection):
+        return get_watering_history(
+            limit, skip, mode, start_datetime, end_datetime, projection
+        )
+
+    return respond_series(
+        request, "watering_history", fetch, columnar.WATERING_COLUMNS, fields, format
+    )
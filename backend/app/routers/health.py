@@ -0,0 +1,34 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.container import container
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def liveness():
+    """The process is up and serving requests (no dependency checks)"""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Ready when MongoDB answers a ping and startup initialization (indexes,
+    Cloudinary config) has finished. Returns 503 otherwise.
+    """
+    mongo_error = await asyncio.to_thread(container.ping_mongo)
+    checks = {
+        "mongodb": "ok" if mongo_error is None else mongo_error,
+        "database_init": container.status["database"],
+    }
+    if container.mqtt_started:
+        checks["mqtt"] = "ok" if container.mqtt.is_connected() else "disconnected"
+    ready = mongo_error is None and checks["database_init"] == "ready"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks},
+    )
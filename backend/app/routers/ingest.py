@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from app.database.dead_letters import dead_letters, get_dead_letters
+from app.mqtt_client import decoder
+from app.serialization import BSONJSONResponse
+
+router = APIRouter(
+    prefix="/api/ingest", tags=["ingest"], default_response_class=BSONJSONResponse
+)
+
+
+@router.get("/stats")
+async def ingest_stats():
+    """
+    Accepted / rejected MQTT messages per subscribed topic pattern since startup
+
+    Rejections are grouped by reason (too_large, invalid_json, schema,
+    unknown_topic); `dead_letters` shows how many were stored vs. only counted.
+    """
+    return {**decoder.stats(), "dead_letters": dead_letters.stats}
+
+
+@router.get("/dead-letters")
+async def list_dead_letters(
+    limit: int = Query(50, ge=1, le=500),
+    reason: Optional[str] = Query(None, max_length=32),
+):
+    """Most recent rejected messages, with a preview of their payload"""
+    return get_dead_letters(limit=limit, reason=reason)
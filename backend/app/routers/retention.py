@@ -0,0 +1,35 @@
+import asyncio
+
+from fastapi import APIRouter
+
+from app.database.retention import compaction_status, retention_tiers, run_compaction
+from app.response_cache import response_cache
+from app.serialization import BSONJSONResponse
+
+router = APIRouter(
+    prefix="/api/retention", tags=["retention"], default_response_class=BSONJSONResponse
+)
+
+
+@router.get("/status")
+async def retention_status():
+    """
+    Retention tiers and progress of the current / last compaction run
+
+    `archived`, `deleted` and `hourly_upserts` count documents of the run;
+    `days_done` / `days_total` show how far it got.
+    """
+    return {
+        "tiers": [
+            {"collection": t.collection, "raw_days": t.raw_days, "hourly": t.hourly}
+            for t in retention_tiers()
+        ],
+        "compaction": compaction_status,
+    }
+
+
+@router.post("/run")
+async def run_retention_now():
+    """Run a compaction pass now (skipped if one is already running)"""
+    status = await asyncio.to_thread(run_compaction, response_cache.invalidate)
+    return {"success": status["last_error"] is None, "compaction": status}
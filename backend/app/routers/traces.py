@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Query
+
+from app.config import get_config
+from app.tracing import profile_requests, tracer
+
+router = APIRouter(prefix="/api/traces", tags=["traces"])
+
+
+@router.get("/stats")
+async def trace_stats():
+    """Tracer counters (recorded, dropped, exported spans) and pending profiles"""
+    return {
+        "enabled": tracer.exporter is not None,
+        "sample_rate": tracer.sample_rate,
+        "stats": tracer.stats,
+        "profiles_pending": profile_requests.remaining,
+    }
+
+
+@router.post("/profile")
+async def profile_ingest(messages: int = Query(1, ge=1, le=100)):
+    """
+    Profile the handling of the next N MQTT messages
+
+    One cProfile (or pyinstrument, if installed) dump per message is written
+    to PROFILE_DIR.
+    """
+    profile_requests.arm(messages)
+    return {"success": True, "messages": messages, "directory": get_config().profile_dir}
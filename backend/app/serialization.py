@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(obj: Any):
+    # Only called for types orjson does not know; datetimes, floats, dicts and
+    # lists are handled natively in C
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize Mongo documents to JSON in a single pass (ObjectId -> str)"""
+    return orjson.dumps(content, default=_default)
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSONResponse backed by orjson that also understands ObjectId"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def build_projection(
+    fields: Optional[str], exclude: Optional[Dict[str, int]] = None
+) -> Optional[Dict[str, int]]:
+    """
+    Mongo projection from a `fields=a,b,c` query parameter.
+
+    Without `fields`, the collection's default exclusions (internal
+    bookkeeping fields) are applied instead.
+    """
+    if fields:
+        projection = {name.strip(): 1 for name in fields.split(",") if name.strip()}
+        return projection or None
+    return dict(exclude) if exclude else None
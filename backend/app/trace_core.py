@@ -0,0 +1,304 @@
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+
+# Shared by the edge and the backend so spans from both sides join into one
+# trace. Standard library only. code_in_circuit/tracing.py is the source;
+# backend/app/trace_core.py is a byte-identical copy so the API deploys
+# without the device tree (backend/tests/test_trace_core.py checks they match).
+#
+# Trace context travels in MQTT payloads as a W3C traceparent string:
+#   "00-<32 hex trace id>-<16 hex parent span id>-<flags, 01 = sampled>"
+TRACEPARENT_KEY = "traceparent"
+
+
+def parse_traceparent(value):
+    """-> (trace_id, span_id, sampled), or None if missing / malformed"""
+    if not isinstance(value, str):
+        return None
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes")
+
+    def __init__(self, trace_id, parent_id, name, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes or {}
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self, service) -> dict:
+        return {
+            "service": service,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class JsonlExporter:
+    """Append finished spans to a JSONL file, one span per line.
+
+    Once the file reaches `max_bytes` it is rotated to `<path>.1` (up to
+    `backups` old files), so traces never fill the SD card.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 5 * 1024 * 1024, backups: int = 1):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotate(self):
+        for index in range(self.backups, 0, -1):
+            source = self.path if index == 1 else f"{self.path}.{index - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+        if self.backups <= 0 and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def export(self, spans: list):
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            pass  # no file yet
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+
+
+class OtlpHttpExporter:
+    """POST spans as OTLP/JSON, e.g. to a local OpenTelemetry collector
+    (http://localhost:4318/v1/traces)."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    @staticmethod
+    def _attributes(values: dict) -> list:
+        return [{"key": k, "value": {"stringValue": str(v)}} for k, v in values.items()]
+
+    def export(self, spans: list):
+        by_service = {}
+        for span in spans:
+            otlp = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(int(span["start"] * 1e9)),
+                "endTimeUnixNano": str(int((span["start"] + span["duration_ms"] / 1000) * 1e9)),
+                "attributes": self._attributes(span["attributes"]),
+            }
+            if span["parent_id"]:
+                otlp["parentSpanId"] = span["parent_id"]
+            by_service.setdefault(span["service"], []).append(otlp)
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": self._attributes({"service.name": service})},
+                    "scopeSpans": [{"scope": {"name": "tomatobuddy"}, "spans": items}],
+                }
+                for service, items in by_service.items()
+            ]
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+
+class Tracer:
+    """Low-overhead span recorder with head-based sampling.
+
+    A trace starts at `span(..., root=True)` (sampled with `sample_rate`) or
+    continues from an incoming traceparent, whose sampling decision is kept.
+    Nested span() calls on the same thread become children of the current
+    span; without an active sampled span they cost one attribute lookup and
+    record nothing, so the hot path stays cheap for unsampled work.
+
+    Finished spans are queued in memory and written by a background thread
+    every `flush_interval` seconds. When the queue is full new spans are
+    dropped (counted in `stats["dropped"]`) rather than blocking.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        exporter=None,
+        sample_rate: float = 0.1,
+        flush_interval: float = 5.0,
+        max_queue: int = 2048,
+    ):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._local = threading.local()
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"spans": 0, "dropped": 0, "exported": 0, "export_errors": 0}
+
+    def current(self):
+        return getattr(self._local, "span", None)
+
+    @contextmanager
+    def span(self, name: str, parent=None, root: bool = False, sampled=None, **attributes):
+        """Record `name` as a span. Yields the Span, or None when not sampled.
+
+        parent: a traceparent string (from a payload) or None for the
+        thread's current span. root: start a new trace if there is no parent.
+        sampled: force (True) or skip (False) sampling of a new root trace.
+        """
+        current = self.current()
+        context = parse_traceparent(parent) if parent is not None else None
+        if self.exporter is None:
+            yield None
+            return
+        if context is not None:
+            trace_id, parent_id, is_sampled = context
+            if not is_sampled:
+                yield None
+                return
+        elif current is not None:
+            trace_id, parent_id = current.trace_id, current.span_id
+        elif root:
+            if sampled is None:
+                sampled = random.random() < self.sample_rate
+            if not sampled:
+                yield None
+                return
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        else:
+            yield None
+            return
+
+        span = Span(trace_id, parent_id, name, attributes)
+        self._local.span = span
+        try:
+            yield span
+        except Exception as e:
+            span.set("error", str(e))
+            raise
+        finally:
+            span.end = time.time()
+            self._local.span = current
+            self._record(span)
+
+    # StageTimer-compatible, so the detection pipeline can report into traces
+    stage = span
+
+    def inject(self, payload: dict) -> dict:
+        """Add the current span's traceparent to an outgoing payload."""
+        span = self.current()
+        if span is not None:
+            payload[TRACEPARENT_KEY] = span.traceparent()
+        return payload
+
+    def _record(self, span):
+        with self._lock:
+            self.stats["spans"] += 1
+            if len(self._queue) >= self.max_queue:
+                self.stats["dropped"] += 1
+                return
+            self._queue.append(span.to_dict(self.service))
+
+    # -------------------- EXPORT --------------------
+
+    def flush(self):
+        with self._lock:
+            spans = list(self._queue)
+            self._queue.clear()
+        if not spans or self.exporter is None:
+            return
+        try:
+            self.exporter.export(spans)
+            self.stats["exported"] += len(spans)
+        except Exception as e:
+            self.stats["export_errors"] += 1
+            print(f"[TRACE] Export failed: {e}")
+
+    def run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        threading.Thread(target=self.run, name="trace-export", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+@contextmanager
+def profiled(name: str, enabled: bool = True, directory: str = "profiles"):
+    """Profile the block and write the result to `directory`.
+
+    Uses pyinstrument (HTML report) when installed, else cProfile (.prof,
+    open with `python -m pstats` or snakeviz). Yields the output path.
+    """
+    if not enabled:
+        yield None
+        return
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        path = os.path.join(directory, f"{name}-{stamp}.html")
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield path
+        finally:
+            profiler.stop()
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+    else:
+        import cProfile
+
+        path = os.path.join(directory, f"{name}-{stamp}.prof")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    print(f"[TRACE] Profile written to {path}")
@@ -0,0 +1,55 @@
+import threading
+
+# Span model, exporters, Tracer and profiled() are shared with the edge:
+# app/trace_core.py is a verbatim copy of code_in_circuit/tracing.py
+from app.trace_core import (  # noqa: F401
+    TRACEPARENT_KEY,
+    JsonlExporter,
+    OtlpHttpExporter,
+    Span,
+    Tracer,
+    parse_traceparent,
+    profiled,
+)
+
+
+class ProfileRequests:
+    """Profile the next N ingested MQTT messages, armed from the API."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._remaining = 0
+
+    def arm(self, count: int):
+        with self._lock:
+            self._remaining = count
+
+    def take(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+
+def make_exporter(config):
+    """TRACE_COLLECTOR_URL (OTLP/HTTP) wins over TRACE_FILE; neither = tracing off"""
+    if config.trace_collector_url:
+        return OtlpHttpExporter(config.trace_collector_url)
+    if config.trace_file:
+        return JsonlExporter(config.trace_file, max_bytes=config.trace_file_max_bytes)
+    return None
+
+
+def configure_tracing(config):
+    """Called from main.lifespan; until then every span is a no-op"""
+    tracer.exporter = make_exporter(config)
+    tracer.sample_rate = config.trace_sample_rate
+
+
+tracer = Tracer("tomatobuddy-backend")
+profile_requests = ProfileRequests()
@@ -0,0 +1,190 @@
+"""
+Decode-time benchmark for inbound MQTT payloads.
+
+Compares the old path (bytes.decode + json.loads, then dict lookups and
+float() in the handler) with app.mqtt_messages (size check, then pydantic-core
+parses and validates the bytes in one pass) on a realistic message mix:
+sensor readings, window aggregates, command acks, inference results with a
+~32 KiB base64 crop, and a share of malformed / oversized payloads.
+
+The result is compared with the fleet's expected message rate, i.e. how much
+of one core ingest decoding would take.
+
+Run from the backend directory:
+    python -m benchmarks.bench_mqtt_decode [--messages 5000] [--devices 200]
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime
+
+from app.mqtt_messages import (
+    CommandAckMessage,
+    InferenceMessage,
+    MessageDecoder,
+    RejectedMessage,
+    SensorMessage,
+    WateringMessage,
+)
+
+SENSOR_TOPIC = "pizero2w/sensorreading"
+INFERENCE_TOPIC = "pizero2w/inference"
+WATERING_TOPIC = "pizero2w/watering"
+ACK_TOPIC = "pizero2w/ack/capture"
+
+# Same table as app.mqtt_client (not imported: it pulls in the DB layer)
+decoder = MessageDecoder(
+    {
+        SENSOR_TOPIC: (SensorMessage, 4 * 1024),
+        INFERENCE_TOPIC: (InferenceMessage, 128 * 1024),
+        WATERING_TOPIC: (WateringMessage, 4 * 1024),
+        "pizero2w/ack/+": (CommandAckMessage, 4 * 1024),
+    }
+)
+
+SENSOR_KEYS = ("temp", "humidity", "moisture", "light", "water_level")
+
+
+def sensor_reading():
+    return {
+        "temp": round(20 + random.random() * 10, 1),
+        "humidity": round(50 + random.random() * 30, 1),
+        "moisture": random.randint(0, 30000),
+        "light": round(random.random() * 1000, 1),
+        "water_level": round(random.random() * 100, 1),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def sensor_aggregate():
+    payload = {
+        "aggregate": True,
+        "count": 60,
+        "window_start": datetime.now().isoformat(),
+        "window_end": datetime.now().isoformat(),
+    }
+    for key in SENSOR_KEYS:
+        low = random.random() * 50
+        payload[key] = {"min": low, "mean": low + 1.5, "max": low + 3}
+    return payload
+
+
+def inference():
+    return {
+        "image_id": f"{int(time.time())}_{random.randint(0, 9)}",
+        "prediction": "Early Blight",
+        "confidence": round(random.random(), 6),
+        "image_data": base64.b64encode(os.urandom(24 * 1024)).decode(),
+        "jpeg_quality": 70,
+        "phash": f"{random.getrandbits(64):016x}",
+        "model_versions": {"yolov8n": "1.2.0", "mobilenetv2": "0.9.1"},
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def command_ack():
+    return {"command": "capture", "success": True, "duration": 1.2, "scene_score": 0.4}
+
+
+def make_messages(n: int, bad_ratio: float):
+    """-> [(topic, payload bytes)]; roughly what one broker sees per minute"""
+    weights = [
+        (SENSOR_TOPIC, sensor_reading, 60),
+        (SENSOR_TOPIC, sensor_aggregate, 20),
+        (ACK_TOPIC, command_ack, 10),
+        (INFERENCE_TOPIC, inference, 10),
+    ]
+    bad = [
+        (SENSOR_TOPIC, b'{"temp": 21.5, "humidity": '),  # truncated
+        (SENSOR_TOPIC, b'{"temp": "hot", "humidity": 50}'),  # wrong type
+        (INFERENCE_TOPIC, b'{"image_id": "x", "prediction": "Healthy"}'),  # missing field
+        (SENSOR_TOPIC, json.dumps({"junk": "x" * 64 * 1024}).encode()),  # oversized
+    ]
+    messages = []
+    for _ in range(n):
+        if random.random() < bad_ratio:
+            messages.append(random.choice(bad))
+            continue
+        topic, make, _ = random.choices(weights, [w for *_, w in weights])[0]
+        messages.append((topic, json.dumps(make()).encode()))
+    return messages
+
+
+def old_path(topic, payload):
+    # What on_message + the handlers did before typed decoding
+    try:
+        data = json.loads(payload.decode())
+        if topic == SENSOR_TOPIC:
+            if data.get("aggregate"):
+                return {
+                    k: float(data[k]["mean"]) for k in SENSOR_KEYS if isinstance(data.get(k), dict)
+                }
+            return {k: float(data[k]) for k in SENSOR_KEYS if data.get(k) is not None}
+        if topic == INFERENCE_TOPIC:
+            return (data.get("image_id", ""), float(data.get("confidence", 0.0)))
+        return data.get("success", False)
+    except Exception:
+        return None
+
+
+def new_path(topic, payload):
+    try:
+        return decoder.decode(topic, payload)
+    except RejectedMessage:
+        return None
+
+
+def bench(name, func, messages, repeat):
+    best = min(timed(func, messages) for _ in range(repeat))
+    per_message = best / len(messages)
+    print(f"{name:<36} {per_message * 1e6:8.1f} µs/msg {1 / per_message:10.0f} msgs/s")
+    return per_message
+
+
+def timed(func, messages):
+    start = time.perf_counter()
+    for topic, payload in messages:
+        func(topic, payload)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--bad-ratio", type=float, default=0.05)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--rate-per-device", type=float, default=1.0, help="msgs/s per device")
+    args = parser.parse_args()
+
+    random.seed(0)
+    messages = make_messages(args.messages, args.bad_ratio)
+    size = sum(len(p) for _, p in messages)
+    print(
+        f"{len(messages)} messages, {size / len(messages) / 1024:.1f} KiB average, "
+        f"{args.bad_ratio:.0%} malformed, best of {args.repeat}"
+    )
+
+    old = bench("json.loads + float()", old_path, messages, args.repeat)
+    new = bench("MessageDecoder (pydantic-core)", new_path, messages, args.repeat)
+    print(f"{'':<36} {old / new:8.1f}x")
+
+    fleet_rate = args.devices * args.rate_per_device
+    print(
+        f"\nFleet: {args.devices} devices x {args.rate_per_device} msgs/s = {fleet_rate:.0f} msgs/s"
+        f" -> decoding uses {fleet_rate * new:.1%} of one core"
+        f" (was {fleet_rate * old:.1%})"
+    )
+
+    rejected = Counter()
+    for row in decoder.stats()["rejected"]:
+        rejected[row["reason"]] += row["count"] // args.repeat
+    print("Rejected per run:", dict(rejected))
+
+
+if __name__ == "__main__":
+    main()
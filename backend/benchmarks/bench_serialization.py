@@ -0,0 +1,101 @@
+"""
+Encode-time and payload-size benchmark for the data API serializers.
+
+Compares the old path (stringify `_id` in a Python loop, then FastAPI's
+jsonable_encoder + json.dumps) with app.serialization.dumps (orjson, ObjectId
+handled in the same pass), with and without a projection.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialization [--rows 1000] [--repeat 200]
+"""
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.serialization import dumps
+
+
+def make_image_rows(n: int):
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "image_id": f"{1700000000 + i}_1",
+            "prediction": random.choice(["Healthy", "Early Blight", "Leaf Mold"]),
+            "confidence": random.random(),
+            "image_url": f"https://res.cloudinary.com/demo/image/upload/v1/tomato_buddy/tomato_{i}.jpg",
+            "timestamp": now - timedelta(minutes=i),
+            "phash": f"{random.getrandbits(64):016x}",
+            "model_versions": {"yolov8n": "1.2.0", "mobilenetv2": "0.9.1"},
+        }
+        for i in range(n)
+    ]
+
+
+def make_sensor_rows(n: int):
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "temperature": 20 + random.random() * 10,
+            "humidity": 50 + random.random() * 30,
+            "moisture": random.random() * 30000,
+            "light": 0.0,
+            "water_level": 0.0,
+            "sample_count": 1,
+            "timestamp": now - timedelta(minutes=i),
+        }
+        for i in range(n)
+    ]
+
+
+def old_path(rows):
+    rows = [dict(r) for r in rows]
+    for item in rows:
+        item["_id"] = str(item["_id"])
+    return json.dumps(
+        jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def new_path(rows):
+    return dumps(rows)
+
+
+def project(rows, exclude):
+    return [{k: v for k, v in r.items() if k not in exclude} for r in rows]
+
+
+def bench(name, func, rows, repeat):
+    seconds = min(timeit.repeat(lambda: func(rows), number=1, repeat=repeat))
+    size = len(func(rows))
+    print(f"{name:<40} {seconds * 1000:8.2f} ms {size / 1024:8.1f} KiB")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    images = make_image_rows(args.rows)
+    sensors = make_sensor_rows(args.rows)
+    projected_images = project(images, {"phash", "model_versions"})
+    assert json.loads(old_path(sensors)) == json.loads(new_path(sensors))
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for label, rows in (("sensor_readings", sensors), ("image_data", images)):
+        old = bench(f"{label}: loop + jsonable_encoder", old_path, rows, args.repeat)
+        new = bench(f"{label}: orjson one pass", new_path, rows, args.repeat)
+        print(f"{'':<40} {old / new:8.1f}x faster")
+    bench("image_data: orjson + projection", new_path, projected_images, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cold-start benchmark: import time and lifespan startup with no services.
+
+Each sample runs in a fresh interpreter with MONGODB_URI pointing at an
+unroutable address and no MQTT broker, so any network I/O at import or
+startup shows up as a multi-second outlier. Exits non-zero when the median
+import time exceeds --budget.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup [--runs 5] [--budget 1.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    live = client.get("/health/live").status_code
+    started_up = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "startup_s": started_up - imported,
+    "live": live,
+}))
+"""
+
+
+def run_once(env) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="Max median import time (s)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update(
+        {
+            # 10.255.255.1 is not routable: a connect attempt would hang until timeout
+            "MONGODB_URI": "mongodb://10.255.255.1:27017",
+            "MQTT_BROKER": "10.255.255.1",
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+    )
+    samples = [run_once(env) for _ in range(args.runs)]
+    imports = [s["import_s"] for s in samples]
+    startups = [s["startup_s"] for s in samples]
+
+    print(f"{'':<10}{'median':>10}{'max':>10}")
+    print(f"{'import':<10}{statistics.median(imports):>10.3f}{max(imports):>10.3f}")
+    print(f"{'startup':<10}{statistics.median(startups):>10.3f}{max(startups):>10.3f}")
+    print(f"liveness status: {samples[-1]['live']}")
+
+    if statistics.median(imports) > args.budget:
+        print(f"FAIL: median import time above {args.budget}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
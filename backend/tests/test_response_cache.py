@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from bson import ObjectId
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import app.database.mongodb as mongodb
+from app.response_cache import ResponseCache
+
+
+class FakeCollection:
+    def __init__(self, doc):
+        self.doc = doc
+
+    def find_one(self, *args, **kwargs):
+        return self.doc
+
+
+class FakeDatabase:
+    def __init__(self, doc):
+        self.doc = doc
+
+    def __getitem__(self, name):
+        return FakeCollection(self.doc)
+
+
+def make_client(monkeypatch, oid):
+    monkeypatch.setattr(mongodb, "db", FakeDatabase({"_id": oid}))
+    cache = ResponseCache()
+    app = FastAPI()
+
+    @app.get("/readings")
+    def readings(request: Request):
+        return cache.respond(request, "sensor_readings", lambda: [{"_id": str(oid)}])
+
+    return TestClient(app)
+
+
+def test_last_modified_from_real_object_id(monkeypatch):
+    # ObjectId.generation_time carries bson's own UTC tzinfo, not timezone.utc
+    oid = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(minutes=5))
+    client = make_client(monkeypatch, oid)
+
+    response = client.get("/readings")
+    assert response.status_code == 200
+    last_modified = response.headers["last-modified"]
+    assert parsedate_to_datetime(last_modified) == oid.generation_time
+
+    revalidated = client.get("/readings", headers={"If-Modified-Since": last_modified})
+    assert revalidated.status_code == 304
+    etag = client.get("/readings", headers={"If-None-Match": response.headers["etag"]})
+    assert etag.status_code == 304
+
+
+def test_change_in_current_second_has_no_last_modified(monkeypatch):
+    client = make_client(monkeypatch, ObjectId())
+
+    response = client.get("/readings")
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
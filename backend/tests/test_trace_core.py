@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import pytest
+
+BACKEND_COPY = Path(__file__).resolve().parents[1] / "app" / "trace_core.py"
+EDGE_SOURCE = Path(__file__).resolve().parents[2] / "code_in_circuit" / "tracing.py"
+
+
+@pytest.mark.skipif(not EDGE_SOURCE.exists(), reason="device source tree not checked out")
+def test_backend_copy_matches_edge_tracing():
+    # Edit code_in_circuit/tracing.py, then copy it over app/trace_core.py
+    assert BACKEND_COPY.read_bytes() == EDGE_SOURCE.read_bytes()
+
+
+def test_traceparent_round_trip():
+    from app.trace_core import Span, parse_traceparent
+
+    span = Span("ab" * 16, None, "backend.dispatch")
+    assert parse_traceparent(span.traceparent()) == ("ab" * 16, span.span_id, True)
+    assert parse_traceparent("00-bad") is None
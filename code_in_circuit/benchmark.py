@@ -0,0 +1,310 @@
+"""Offline benchmark of the edge pipeline, no Pi hardware needed.
+
+Replays a folder of images or a video file through the same stages the
+device runs (decode, preprocess, detect, NMS, dedup, classify, encode,
+publish) and reports frames/s, per-stage latency and peak memory. Optionally
+replays a sensor trace through the simulated DHT/ADC and the telemetry
+reporter, and its moisture column through the watering controller driving a
+FakeRelay on a simulated clock.
+
+    python benchmark.py --frames samples/ --detector models/best_float32.tflite \\
+        --classifier models/mobilenetv2_float32.tflite --sensor-trace trace.csv
+
+Without model files, --synthetic uses stand-in interpreters with fixed
+outputs, which measures everything except the TFLite invoke itself.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from hardware import (
+    FakeRelay,
+    ImageFolderCamera,
+    RecordingPublisher,
+    SimulatedADC,
+    SimulatedClock,
+    SimulatedDHT,
+    VideoFileCamera,
+    load_sensor_trace,
+)
+from model_registry import LoadedModel
+from crop_dedup import CropCache
+from pipeline import LABELS, DetectionPipeline, StageTimer
+from telemetry import TelemetryReporter
+from watering import TOPIC_WATERING, WateringController
+
+TOPIC_SENSOR = "pizero2w/sensorreading"
+TOPIC_INFERENCE = "pizero2w/inference"
+
+
+def make_interpreter(path: str):
+    try:
+        import tflite_runtime.interpreter as tflite
+    except ImportError:
+        import tensorflow.lite as tflite
+    interpreter = tflite.Interpreter(model_path=path)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+class SyntheticInterpreter:
+    """Deterministic stand-in with the TFLite interpreter calls the pipeline uses."""
+
+    def __init__(self, input_shape, output):
+        self._input = [{"index": 0, "shape": np.array(input_shape), "dtype": np.float32}]
+        self._output = [{"index": 0}]
+        self._result = output
+
+    def get_input_details(self):
+        return self._input
+
+    def get_output_details(self):
+        return self._output
+
+    def set_tensor(self, index, value):
+        self._tensor = value
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return self._result
+
+
+def synthetic_detector_output(boxes: int = 6, candidates: int = 8400, seed: int = 0):
+    """YOLOv8-shaped output (1, 4 + classes, N) with `boxes` confident, spread-out boxes."""
+    rng = np.random.default_rng(seed)
+    output = np.zeros((1, 5, candidates), dtype=np.float32)
+    output[0, :4] = rng.uniform(0.1, 0.9, size=(4, candidates))
+    output[0, 4] = rng.uniform(0.0, 0.3, size=candidates)
+    for i in range(boxes):
+        output[0, :, i] = [(i % 3 + 0.5) / 3, (i // 3 + 0.5) / 3, 0.2, 0.2, 0.9]
+    return output
+
+
+class StaticModels:
+    """ModelRegistry stand-in: always the same two models."""
+
+    def __init__(self, detector: LoadedModel, classifier: LoadedModel):
+        self._active = {"yolov8n": detector, "mobilenetv2": classifier}
+
+    def snapshot(self):
+        return dict(self._active)
+
+
+def load_models(opts) -> StaticModels:
+    if opts.synthetic:
+        detector = SyntheticInterpreter((1, 640, 640, 3), synthetic_detector_output())
+        scores = np.full((1, len(LABELS)), 0.01, dtype=np.float32)
+        scores[0, 2] = 0.9
+        classifier = SyntheticInterpreter((1, 96, 96, 3), scores)
+        return StaticModels(
+            LoadedModel(detector, "synthetic", Path("-")),
+            LoadedModel(classifier, "synthetic", Path("-")),
+        )
+    if not (opts.detector and opts.classifier):
+        raise SystemExit("--detector and --classifier are required unless --synthetic is set")
+    models = StaticModels(
+        LoadedModel(make_interpreter(opts.detector), "bench", Path(opts.detector)),
+        LoadedModel(make_interpreter(opts.classifier), "bench", Path(opts.classifier)),
+    )
+    for model in models.snapshot().values():
+        model.warm_up()
+    return models
+
+
+def open_camera(path: str):
+    camera = ImageFolderCamera(path) if os.path.isdir(path) else VideoFileCamera(path)
+    if not camera.isOpened():
+        raise SystemExit(f"No frames in {path}")
+    return camera
+
+
+def bench_frames(opts, models) -> dict:
+    camera = open_camera(opts.frames)
+    publisher = RecordingPublisher()
+    crop_cache = None if opts.no_dedup else CropCache(grid=16, max_distance=6)
+
+    # Warm-up frames run through an untimed pipeline
+    warm = DetectionPipeline(models, publisher, TOPIC_INFERENCE, crop_cache=None, verbose=False)
+    for _ in range(opts.warmup):
+        ok, frame = camera.read()
+        if ok:
+            warm.run(frame)
+
+    timer = StageTimer()
+    pipeline = DetectionPipeline(
+        models, publisher, TOPIC_INFERENCE, crop_cache=crop_cache, timer=timer, verbose=False
+    )
+    publisher.counts.clear()
+    publisher.bytes.clear()
+
+    frames = 0
+    started = time.perf_counter()
+    while frames < opts.max_frames:
+        with timer.stage("decode"):
+            ok, frame = camera.read()
+        if not ok:
+            break
+        pipeline.run(frame)
+        frames += 1
+    elapsed = time.perf_counter() - started
+    camera.release()
+
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 3) if elapsed > 0 else None,
+        "stages": timer.summary(),
+        "messages": publisher.counts.get(TOPIC_INFERENCE, 0),
+        "payload_bytes": publisher.bytes.get(TOPIC_INFERENCE, 0),
+        "dedup": crop_cache.stats if crop_cache is not None else None,
+    }
+
+
+def bench_sensors(opts) -> dict:
+    trace = load_sensor_trace(opts.sensor_trace)
+    dht, adc = SimulatedDHT(trace, loop=False), SimulatedADC(trace, loop=False)
+    publisher = RecordingPublisher()
+    telemetry = TelemetryReporter(
+        publisher,
+        TOPIC_SENSOR,
+        mode=opts.telemetry_mode,
+        deadbands={"temp": 0.5, "humidity": 2.0, "moisture": 500},
+    )
+    started = time.perf_counter()
+    # TelemetryReporter logs every publish; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in trace:
+            telemetry.add_sample(
+                {"temp": dht.temperature, "humidity": dht.humidity, "moisture": adc.value}
+            )
+        telemetry.flush()
+    elapsed = time.perf_counter() - started
+    return {
+        "samples": len(trace),
+        "samples_per_s": round(len(trace) / elapsed, 1) if elapsed > 0 else None,
+        "published": publisher.counts.get(TOPIC_SENSOR, 0),
+        "payload_bytes": publisher.bytes.get(TOPIC_SENSOR, 0),
+    }
+
+
+def bench_watering(opts) -> dict:
+    trace = [row for row in load_sensor_trace(opts.sensor_trace) if "moisture" in row]
+    clock = SimulatedClock()
+    relay = FakeRelay(clock=clock)
+    adc = SimulatedADC(trace, loop=False)
+    publisher = RecordingPublisher()
+    controller = WateringController(
+        relay,
+        read_moisture=lambda: adc.value,
+        publisher=publisher,
+        dry_threshold=20000,
+        wet_threshold=23000,
+        max_on_time=30,
+        clock=clock,
+    )
+    started = time.perf_counter()
+    # Each tick reads one trace row; the clock jumps by the delay run() would sleep
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in trace:
+            clock.advance(controller.tick())
+    elapsed = time.perf_counter() - started
+    relay.value = False
+    return {
+        "ticks": len(trace),
+        "ticks_per_s": round(len(trace) / elapsed, 1) if elapsed > 0 else None,
+        "simulated_s": round(clock(), 1),
+        "sessions": publisher.counts.get(TOPIC_WATERING, 0),
+        "relay_switches": len(relay.history),
+        "pump_on_s": round(relay.on_time(), 1),
+    }
+
+
+def print_report(report: dict):
+    frames = report.get("frames")
+    if frames:
+        print(f"Frames: {frames['frames']} in {frames['seconds']}s -> {frames['fps']} fps")
+        print(f"{'stage':<12}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, s in frames["stages"].items():
+            print(
+                f"{name:<12}{s['count']:>7}{s['mean_ms']:>10}{s['p50_ms']:>10}"
+                f"{s['p95_ms']:>10}{s['max_ms']:>10}"
+            )
+        print(f"Published {frames['messages']} messages, {frames['payload_bytes']} bytes")
+    sensors = report.get("sensors")
+    if sensors:
+        print(
+            f"Sensors: {sensors['samples']} samples ({sensors['samples_per_s']}/s), "
+            f"{sensors['published']} published"
+        )
+    watering = report.get("watering")
+    if watering:
+        print(
+            f"Watering: {watering['ticks']} ticks ({watering['ticks_per_s']}/s) over "
+            f"{watering['simulated_s']}s simulated, {watering['sessions']} sessions, "
+            f"pump on {watering['pump_on_s']}s"
+        )
+    memory = report["memory"]
+    print(f"Peak memory: {memory['max_rss_mb']} MB RSS", end="")
+    if memory["python_peak_mb"] is not None:
+        print(f", {memory['python_peak_mb']} MB traced Python allocations", end="")
+    print()
+
+
+def main(args=None) -> dict:
+    parser = argparse.ArgumentParser(description="Benchmark the edge pipeline offline")
+    parser.add_argument("--frames", help="Image folder or video file to replay")
+    parser.add_argument("--max-frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--detector", help="YOLOv8 .tflite file")
+    parser.add_argument("--classifier", help="MobileNetV2 .tflite file")
+    parser.add_argument("--synthetic", action="store_true", help="Stand-in models, no TFLite")
+    parser.add_argument("--no-dedup", action="store_true", help="Disable the crop cache")
+    parser.add_argument("--sensor-trace", help="CSV with temp, humidity, moisture columns")
+    parser.add_argument("--telemetry-mode", default="deadband", choices=("deadband", "aggregate"))
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Track Python allocations with tracemalloc (slows the timed stages)",
+    )
+    parser.add_argument("--json", help="Also write the report to this file")
+    opts = parser.parse_args(args)
+    if not opts.frames and not opts.sensor_trace:
+        parser.error("nothing to replay: give --frames and/or --sensor-trace")
+
+    if opts.trace_memory:
+        tracemalloc.start()
+    report = {}
+    if opts.frames:
+        report["frames"] = bench_frames(opts, load_models(opts))
+    if opts.sensor_trace:
+        report["sensors"] = bench_sensors(opts)
+        report["watering"] = bench_watering(opts)
+    peak = None
+    if opts.trace_memory:
+        peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    report["memory"] = {
+        "python_peak_mb": peak,
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+    print_report(report)
+    if opts.json:
+        Path(opts.json).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
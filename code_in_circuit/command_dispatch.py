@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+TOPIC_COMMAND = "pizero2w/commands"
+TOPIC_SETTINGS = "pizero2w/settings"
+TOPIC_ACK_PREFIX = "pizero2w/ack/"
+
+
+class CommandDispatcher:
+    """Route MQTT commands to one worker thread per command name.
+
+    Every command has a single pending slot. A request that arrives while the
+    same command is still waiting to run is merged into it (latest params win),
+    so a burst of duplicate requests runs once and is acknowledged once.
+    Different commands never block each other: a long watering run does not
+    delay a capture.
+    """
+
+    def __init__(
+        self,
+        client,
+        command_topic: str = TOPIC_COMMAND,
+        settings_topic: str = TOPIC_SETTINGS,
+        ack_prefix: str = TOPIC_ACK_PREFIX,
+        tracer=None,
+    ):
+        self.client = client
+        self.tracer = tracer
+        self.command_topic = command_topic
+        self.settings_topic = settings_topic
+        self.ack_prefix = ack_prefix
+
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._merges = {}
+        self._events = {}
+        self._pending = {}  # command -> latest params
+        self._coalesced = {}  # command -> number of merged duplicates
+        self._traces = {}  # command -> traceparent of the latest request
+
+    def register(self, command: str, handler, merge=None):
+        """Register `handler(params: dict)` for a command name.
+
+        The handler returns a bool, or a dict with a "success" key whose other
+        entries are added to the ack payload. `merge(pending, new)` combines
+        the params of a duplicate request; by default the latest params win.
+        """
+        self._handlers[command] = handler
+        self._merges[command] = merge
+        self._events[command] = threading.Event()
+
+    def start(self):
+        for command in self._handlers:
+            threading.Thread(
+                target=self._worker, args=(command,), name=f"cmd-{command}", daemon=True
+            ).start()
+
+    # -------------------- MQTT ENTRY POINT --------------------
+
+    def on_message(self, client, userdata, msg):
+        # Runs on paho's network thread: an exception escaping here would kill
+        # the MQTT loop, and the topic is reachable by anyone on the broker
+        try:
+            data = json.loads(msg.payload.decode())
+            if not isinstance(data, dict):
+                print(f"[ERROR] Ignoring MQTT message on {msg.topic}: not a JSON object")
+                return
+
+            if msg.topic == self.settings_topic:
+                command, params = "settings", data.get("settings") or {}
+            elif msg.topic == self.command_topic:
+                command, params = data.get("command", ""), data.get("params") or {}
+            else:
+                return
+            if not isinstance(command, str) or not isinstance(params, dict):
+                print(f"[ERROR] Ignoring malformed command on {msg.topic}")
+                return
+
+            traceparent = data.get("traceparent")
+            with self._span("device.receive", traceparent, command=command) as span:
+                traceparent = span.traceparent() if span is not None else traceparent
+                self.submit(command, params, traceparent=traceparent)
+        except Exception as e:
+            print(f"[ERROR] Failed to handle MQTT message on {msg.topic}: {e}")
+
+    def _span(self, name, traceparent=None, root=False, **attributes):
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, parent=traceparent, root=root, **attributes)
+
+    def submit(
+        self, command: str, params: dict | None = None, traceparent: str | None = None
+    ) -> bool:
+        """Queue a command. Returns False if it was merged or rejected."""
+        if command not in self._handlers:
+            print(f"[CMD] Unsupported command: {command!r}")
+            self._publish_ack(command or "unknown", False, error="unsupported command")
+            return False
+
+        with self._lock:
+            if command in self._pending:
+                merge = self._merges[command]
+                if merge is not None:
+                    params = merge(self._pending[command], params or {})
+                self._pending[command] = params or {}
+                self._traces[command] = traceparent or self._traces.get(command)
+                self._coalesced[command] += 1
+                print(f"[CMD] '{command}' already pending, merged duplicate")
+                return False
+            self._pending[command] = params or {}
+            self._traces[command] = traceparent
+            self._coalesced[command] = 0
+            self._events[command].set()
+        print(f"[CMD] '{command}' queued")
+        return True
+
+    # -------------------- WORKERS --------------------
+
+    def _worker(self, command: str):
+        event = self._events[command]
+        handler = self._handlers[command]
+        while True:
+            event.wait()
+            with self._lock:
+                event.clear()
+                if command not in self._pending:
+                    continue
+                params = self._pending.pop(command)
+                coalesced = self._coalesced.pop(command)
+                traceparent = self._traces.pop(command, None)
+
+            # Commands without a trace context (periodic captures) may start one
+            with self._span(f"command.{command}", traceparent, root=True, coalesced=coalesced):
+                started = time.monotonic()
+                error = None
+                details = {}
+                try:
+                    result = handler(params)
+                    if isinstance(result, dict):
+                        details = dict(result)
+                        success = bool(details.pop("success", True))
+                    else:
+                        success = bool(result)
+                except Exception as e:
+                    print(f"[ERROR] Command '{command}' failed: {e}")
+                    success, error = False, str(e)
+
+                self._publish_ack(
+                    command,
+                    success,
+                    error=error,
+                    coalesced=coalesced,
+                    duration=round(time.monotonic() - started, 3),
+                    **details,
+                )
+
+    def _publish_ack(self, command: str, success: bool, **extra):
+        payload = {
+            "command": command,
+            "success": success,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        payload.update({k: v for k, v in extra.items() if v is not None})
+        if self.tracer is not None:
+            self.tracer.inject(payload)
+        try:
+            self.client.publish(self.ack_prefix + command, json.dumps(payload))
+        except Exception as e:
+            print(f"[ERROR] Failed to publish ack for '{command}': {e}")
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """64-bit difference hash: cheap and stable under small light/JPEG changes."""
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class CropCache:
+    """LRU of recent crop hashes and their classifications, per box position.
+
+    The camera is fixed, so the same leaf shows up at roughly the same place
+    in every capture. Boxes are bucketed by their centre on a coarse grid and
+    each bucket keeps its last few hashes. A crop within `max_distance` bits
+    of a cached hash reuses that prediction instead of being classified,
+    encoded and uploaded again. Entries expire after `max_age` seconds so a
+    leaf is still re-checked periodically as a disease develops.
+    """
+
+    def __init__(
+        self,
+        grid: int = 16,
+        max_distance: int = 6,
+        per_position: int = 4,
+        max_positions: int = 256,
+        max_age: float = 24 * 3600,
+    ):
+        self.grid = grid
+        self.max_distance = max_distance
+        self.per_position = per_position
+        self.max_positions = max_positions
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._positions = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def position(self, cx: float, cy: float) -> tuple:
+        """Bucket a normalised box centre (0..1) onto the grid."""
+        return (int(cx * self.grid), int(cy * self.grid))
+
+    def lookup(self, position: tuple, phash: int, model_version: str | None = None):
+        """Return the cached entry for a near-duplicate crop, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._positions.get(position)
+            if entries:
+                entries[:] = [e for e in entries if now - e["cached_at"] < self.max_age]
+                for entry in entries:
+                    if (
+                        entry["model_version"] == model_version
+                        and hamming(entry["phash"], phash) <= self.max_distance
+                    ):
+                        self._positions.move_to_end(position)
+                        self.stats["hits"] += 1
+                        return dict(entry)
+            self.stats["misses"] += 1
+            return None
+
+    def store(
+        self,
+        position: tuple,
+        phash: int,
+        image_id: str,
+        prediction: str,
+        confidence: float,
+        model_version: str | None = None,
+    ):
+        entry = {
+            "phash": phash,
+            "image_id": image_id,
+            "prediction": prediction,
+            "confidence": confidence,
+            "model_version": model_version,
+            "cached_at": time.monotonic(),
+        }
+        with self._lock:
+            entries = self._positions.setdefault(position, [])
+            entries.insert(0, entry)
+            del entries[self.per_position :]
+            self._positions.move_to_end(position)
+            while len(self._positions) > self.max_positions:
+                self._positions.popitem(last=False)
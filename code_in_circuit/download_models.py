@@ -1,62 +1,238 @@
+import argparse
 import asyncio
+import hashlib
+import json
+import os
 import httpx
 from pathlib import Path
-import json
 
 VERSION_URL = "https://huggingface.co/QThang26/TomatoBuddy/resolve/main/version.json"
 MODEL_BASE_URL = "https://huggingface.co/QThang26/TomatoBuddy/resolve/main/"
 MODEL_DIR = Path("models")
 
-MODEL_DIR.mkdir(exist_ok=True)
+CHUNK_SIZE = 64 * 1024
+
+
+class ChecksumError(Exception):
+    pass
 
-async def fetch_version_info():
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        res = await client.get(VERSION_URL)
-        res.raise_for_status()
-        return res.json()
 
-def get_local_version(model_name: str) -> str | None:
-    version_file = MODEL_DIR / f"{model_name}.version"
+def make_client(**kwargs) -> httpx.AsyncClient:
+    """One pooled client for version.json and every model download."""
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=httpx.Timeout(30.0, read=120.0),
+        limits=httpx.Limits(max_connections=2, max_keepalive_connections=2),
+        **kwargs,
+    )
+
+
+async def fetch_version_info(client: httpx.AsyncClient, version_url: str = VERSION_URL):
+    res = await client.get(version_url)
+    res.raise_for_status()
+    return res.json()
+
+
+def get_local_version(model_name: str, model_dir: Path = MODEL_DIR) -> str | None:
+    version_file = model_dir / f"{model_name}.version"
     if version_file.exists():
         return version_file.read_text().strip()
     return None
 
-def save_local_version(model_name: str, version: str):
-    version_file = MODEL_DIR / f"{model_name}.version"
-    version_file.write_text(version)
 
-async def download_model(model_name: str, version: str, filename: str):
-    model_path = MODEL_DIR / filename
-    model_url = f"{MODEL_BASE_URL}{filename}"
+def atomic_write_text(path: Path, text: str):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
-    print(f"Downloading model '{model_name}' version {version}...")
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        res = await client.get(model_url)
+def save_local_version(model_name: str, version: str, model_dir: Path = MODEL_DIR):
+    atomic_write_text(model_dir / f"{model_name}.version", version)
+
+
+def sha256_of(path: Path):
+    digest = hashlib.sha256()
+    if path.exists():
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest
+
+
+def part_paths(model_dir: Path, filename: str):
+    """The partial download and the sidecar recording which release it belongs to."""
+    part_path = model_dir / f"{filename}.part"
+    return part_path, part_path.with_name(part_path.name + ".json")
+
+
+def read_part_meta(meta_path: Path) -> dict:
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def discard_part(part_path: Path, meta_path: Path):
+    part_path.unlink(missing_ok=True)
+    meta_path.unlink(missing_ok=True)
+
+
+async def stream_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    part_path: Path,
+    meta_path: Path,
+    version: str,
+):
+    """Stream `url` into `part_path`, resuming from its current size.
+
+    A partial file is only resumed if its sidecar names the same `version`;
+    the stored ETag is sent as If-Range, so a server whose file changed
+    answers with the full body instead of a mismatched tail.
+
+    Returns (SHA-256 digest of the complete file, resumed).
+    """
+    meta = read_part_meta(meta_path)
+    if part_path.exists() and meta.get("version") != version:
+        print(f"Discarding partial '{part_path.name}' from version {meta.get('version')}")
+        discard_part(part_path, meta_path)
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if meta.get("etag"):
+            headers["If-Range"] = meta["etag"]
+
+    async with client.stream("GET", url, headers=headers) as res:
+        if res.status_code == 416:
+            # Nothing left to fetch; only trusted if the checksum matches
+            return sha256_of(part_path), True
         res.raise_for_status()
-        model_path.write_bytes(res.content)
 
-    save_local_version(model_name, version)
+        if offset and res.status_code == 206:
+            print(f"Resuming '{part_path.name}' from byte {offset}")
+            digest = sha256_of(part_path)
+            mode = "ab"
+            resumed = True
+        else:
+            # Fresh download (or the server ignored Range / If-Range): start over
+            atomic_write_text(
+                meta_path, json.dumps({"version": version, "etag": res.headers.get("etag")})
+            )
+            digest = hashlib.sha256()
+            mode = "wb"
+            resumed = False
+
+        with open(part_path, mode) as f:
+            async for chunk in res.aiter_bytes(CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    return digest, resumed
+
+
+async def download_model(
+    client: httpx.AsyncClient,
+    model_name: str,
+    version: str,
+    filename: str,
+    sha256: str | None = None,
+    base_url: str = MODEL_BASE_URL,
+    model_dir: Path = MODEL_DIR,
+):
+    model_path = model_dir / filename
+    part_path, meta_path = part_paths(model_dir, filename)
+    model_url = f"{base_url}{filename}"
+
+    print(f"Downloading model '{model_name}' version {version}...")
+    digest, resumed = await stream_to_file(client, model_url, part_path, meta_path, version)
+
+    if sha256:
+        if digest.hexdigest() != sha256.lower():
+            discard_part(part_path, meta_path)
+            raise ChecksumError(
+                f"Checksum mismatch for '{filename}': "
+                f"expected {sha256}, got {digest.hexdigest()}"
+            )
+    else:
+        print(f"[WARN] No sha256 for '{model_name}' in version.json, skipping verification")
+        if resumed:
+            # A resumed file cannot be checked end to end: fetch it whole
+            discard_part(part_path, meta_path)
+            await stream_to_file(client, model_url, part_path, meta_path, version)
+
+    # Swap in the new model in one step, then record its version
+    os.replace(part_path, model_path)
+    meta_path.unlink(missing_ok=True)
+    save_local_version(model_name, version, model_dir)
     print(f"Model '{model_name}' downloaded and saved to '{model_path}'")
 
-async def check_and_update_model(model_name: str, info: dict):
+
+async def check_and_update_model(
+    client: httpx.AsyncClient,
+    model_name: str,
+    info: dict,
+    base_url: str = MODEL_BASE_URL,
+    model_dir: Path = MODEL_DIR,
+):
     latest_version = info["version"]
     filename = info["filename"]
-    current_version = get_local_version(model_name)
+    current_version = get_local_version(model_name, model_dir)
 
-    if current_version == latest_version:
+    if current_version == latest_version and (model_dir / filename).exists():
         print(f"Model '{model_name}' is up to date (version {current_version})")
     else:
-        await download_model(model_name, latest_version, filename)
+        await download_model(
+            client,
+            model_name,
+            latest_version,
+            filename,
+            sha256=info.get("sha256"),
+            base_url=base_url,
+            model_dir=model_dir,
+        )
+
+
+async def sync_models(
+    client: httpx.AsyncClient,
+    version_url: str = VERSION_URL,
+    base_url: str = MODEL_BASE_URL,
+    model_dir: Path = MODEL_DIR,
+) -> bool:
+    """Bring every model listed in version.json up to date. Returns True on success."""
+    model_dir.mkdir(parents=True, exist_ok=True)
+    version_info = await fetch_version_info(client, version_url)
+
+    results = await asyncio.gather(
+        *(
+            check_and_update_model(client, model_name, info, base_url, model_dir)
+            for model_name, info in version_info.items()
+        ),
+        return_exceptions=True,
+    )
+    ok = True
+    for model_name, result in zip(version_info, results):
+        if isinstance(result, Exception):
+            print(f"[ERROR] Failed to update '{model_name}': {result}")
+            ok = False
+    return ok
+
 
-async def main():
-    version_info = await fetch_version_info()
-    tasks = []
+async def main(args=None) -> bool:
+    parser = argparse.ArgumentParser(description="Sync TomatoBuddy edge models")
+    parser.add_argument("--version-url", default=VERSION_URL)
+    parser.add_argument("--base-url", default=MODEL_BASE_URL)
+    parser.add_argument("--model-dir", type=Path, default=MODEL_DIR)
+    opts = parser.parse_args(args)
 
-    for model_name, info in version_info.items():
-        tasks.append(check_and_update_model(model_name, info))
+    async with make_client() as client:
+        return await sync_models(client, opts.version_url, opts.base_url, opts.model_dir)
 
-    await asyncio.gather(*tasks)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    raise SystemExit(0 if asyncio.run(main()) else 1)
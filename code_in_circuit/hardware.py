@@ -0,0 +1,209 @@
+"""Stand-ins for the Pi hardware, for running the pipeline on any Linux box.
+
+Each class mimics only the part of the real object the edge code touches:
+  - cameras: cv2.VideoCapture's isOpened / grab / retrieve / read / release
+  - SimulatedADC: AnalogIn.value (16-bit, like the MCP3008 reading)
+  - SimulatedDHT: adafruit_dht.DHT11.temperature / .humidity
+  - FakeRelay: digitalio.DigitalInOut.value
+  - RecordingPublisher: Outbox.publish / client.publish
+"""
+
+import csv
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class VideoFileCamera:
+    """Replay a recorded video file, optionally looping at the end."""
+
+    def __init__(self, path: str, loop: bool = True):
+        self.path = str(path)
+        self.loop = loop
+        self._cap = cv2.VideoCapture(self.path)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def grab(self):
+        if self._cap.grab():
+            return True
+        if not self.loop:
+            return False
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self._cap.grab()
+
+    def retrieve(self):
+        return self._cap.retrieve()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageFolderCamera:
+    """Serve the images of a folder in name order as camera frames.
+
+    grab() only advances; retrieve() decodes, like a real capture device, so
+    the decode cost lands where it does on the Pi.
+    """
+
+    def __init__(self, folder: str, loop: bool = True):
+        self.files = sorted(
+            p for p in Path(folder).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+        )
+        self.loop = loop
+        self._index = -1
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def grab(self):
+        if self._index + 1 >= len(self.files):
+            if not self.loop or not self.files:
+                return False
+            self._index = -1
+        self._index += 1
+        return True
+
+    def retrieve(self):
+        if self._index < 0:
+            return False, None
+        frame = cv2.imread(str(self.files[self._index]))
+        return frame is not None, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        pass
+
+
+def load_sensor_trace(path: str) -> list:
+    """CSV with any of the columns temp, humidity, moisture (one row per read)."""
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            rows.append({k: float(v) for k, v in row.items() if v not in (None, "")})
+    return rows
+
+
+class _TraceCursor:
+    def __init__(self, trace: list, loop: bool = True):
+        self.trace = trace
+        self.loop = loop
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def next_row(self) -> dict:
+        with self._lock:
+            if self._index >= len(self.trace):
+                if not self.loop or not self.trace:
+                    raise RuntimeError("sensor trace exhausted")
+                self._index = 0
+            row = self.trace[self._index]
+            self._index += 1
+        return row
+
+
+class SimulatedADC:
+    """AnalogIn stand-in: each .value read returns the next `moisture` sample."""
+
+    def __init__(self, trace: list, loop: bool = True):
+        self._cursor = _TraceCursor(trace, loop)
+
+    @property
+    def value(self):
+        return int(self._cursor.next_row()["moisture"])
+
+
+class SimulatedDHT:
+    """DHT11 stand-in. Reading .temperature advances to the next trace row,
+    .humidity returns the value from that same row."""
+
+    def __init__(self, trace: list, loop: bool = True):
+        self._cursor = _TraceCursor(trace, loop)
+        self._row = {}
+
+    @property
+    def temperature(self):
+        self._row = self._cursor.next_row()
+        return self._row.get("temp")
+
+    @property
+    def humidity(self):
+        return self._row.get("humidity")
+
+
+class SimulatedClock:
+    """time.monotonic stand-in advanced by hand, so a control loop can replay
+    hours of sensor trace in well under a second."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakeRelay:
+    """Pump relay stand-in that records every switch as (clock time, value)."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._value = False
+        self.history = []
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, on):
+        on = bool(on)
+        if on != self._value:
+            self.history.append((self.clock(), on))
+        self._value = on
+
+    def on_time(self) -> float:
+        """Total seconds the relay has been switched on so far."""
+        total, since = 0.0, None
+        for at, on in self.history:
+            if on:
+                since = at
+            elif since is not None:
+                total += at - since
+                since = None
+        if since is not None:
+            total += self.clock() - since
+        return total
+
+
+class RecordingPublisher:
+    """Outbox stand-in: counts messages and bytes per topic, keeps the last few."""
+
+    def __init__(self, keep: int = 10):
+        self.keep = keep
+        self.messages = []
+        self.counts = {}
+        self.bytes = {}
+
+    def publish(self, topic, payload, qos=0):
+        size = len(payload.encode() if isinstance(payload, str) else payload)
+        self.counts[topic] = self.counts.get(topic, 0) + 1
+        self.bytes[topic] = self.bytes.get(topic, 0) + size
+        self.messages.append((topic, payload))
+        del self.messages[: -self.keep]
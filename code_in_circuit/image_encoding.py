@@ -0,0 +1,50 @@
+import io
+
+from PIL import Image
+
+
+def encode_jpeg(
+    image: Image.Image,
+    target_bytes: int = 24 * 1024,
+    max_side: int = 480,
+    min_quality: int = 40,
+    max_quality: int = 90,
+) -> tuple:
+    """Encode `image` as the best-quality JPEG that fits in `target_bytes`.
+
+    The image is first capped to `max_side` pixels on its longest side, then
+    the quality is binary-searched between `min_quality` and `max_quality`
+    (about 5 encodes for a small crop). If even `min_quality` is too big the
+    smallest encoding is returned anyway.
+
+    Returns (jpeg_bytes, quality).
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    def encode(quality):
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=quality, optimize=True)
+        return buffered.getvalue()
+
+    best = encode(max_quality)
+    if len(best) <= target_bytes:
+        return best, max_quality
+
+    best, best_quality = None, min_quality
+    low, high = min_quality, max_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode(quality)
+        if len(data) <= target_bytes:
+            best, best_quality = data, quality
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        best = encode(min_quality)
+    return best, best_quality
@@ -0,0 +1,121 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class LoadedModel:
+    """A TFLite interpreter with its tensors allocated, plus where it came from."""
+
+    def __init__(self, interpreter, version: str, path: Path):
+        self.interpreter = interpreter
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+        self.version = version
+        self.path = path
+
+    def warm_up(self):
+        # First invoke() pays for delegate/kernel setup; do it off the capture path
+        detail = self.input_details[0]
+        dummy = np.zeros(detail["shape"], dtype=detail["dtype"])
+        self.interpreter.set_tensor(detail["index"], dummy)
+        self.interpreter.invoke()
+
+
+class ModelRegistry:
+    """Keep the active interpreters and hot-swap them when new models land.
+
+    `specs` maps each model name (the key used in version.json and for
+    `models/<name>.version`) to its filename inside `model_dir` and a bundled
+    fallback path used until a downloaded version exists.
+
+    A watcher thread polls the .version files. When one changes, the new
+    model is loaded and warmed up in the background and then swapped in with
+    a single assignment. A capture takes a snapshot() at its start, so it
+    always runs on one consistent set of models and the swap lands between
+    captures.
+    """
+
+    def __init__(
+        self,
+        specs: dict,
+        interpreter_factory,
+        model_dir: str | Path = "models",
+        poll_interval: float = 30.0,
+    ):
+        self.specs = specs
+        self.interpreter_factory = interpreter_factory
+        self.model_dir = Path(model_dir)
+        self.poll_interval = poll_interval
+
+        self._active = {}
+        self._mtimes = {}
+        self._stop = threading.Event()
+
+    def load_initial(self):
+        """Load every model synchronously before the first capture."""
+        active = {}
+        for name in self.specs:
+            self._mtimes[name] = self._version_mtime(name)
+            active[name] = self._load(name)
+        self._active = active
+
+    def snapshot(self) -> dict:
+        return self._active
+
+    def versions(self) -> dict:
+        return {name: model.version for name, model in self._active.items()}
+
+    # -------------------- LOADING --------------------
+
+    def _version_file(self, name: str) -> Path:
+        return self.model_dir / f"{name}.version"
+
+    def _version_mtime(self, name: str):
+        try:
+            return self._version_file(name).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _load(self, name: str) -> LoadedModel:
+        spec = self.specs[name]
+        version_file = self._version_file(name)
+        path = self.model_dir / spec["filename"]
+        if version_file.exists() and path.exists():
+            version = version_file.read_text().strip()
+        else:
+            path, version = Path(spec["fallback"]), "bundled"
+
+        interpreter = self.interpreter_factory(str(path))
+        interpreter.allocate_tensors()
+        model = LoadedModel(interpreter, version, path)
+        model.warm_up()
+        print(f"[MODEL] Loaded '{name}' version {version} from {path}")
+        return model
+
+    # -------------------- WATCHER --------------------
+
+    def check_for_updates(self):
+        for name in self.specs:
+            mtime = self._version_mtime(name)
+            if mtime is None or mtime == self._mtimes.get(name):
+                continue
+            self._mtimes[name] = mtime
+            try:
+                model = self._load(name)
+            except Exception as e:
+                print(f"[ERROR] Failed to load new '{name}' model, keeping current: {e}")
+                continue
+            # Copy-on-write: in-flight captures keep their old snapshot
+            self._active = {**self._active, name: model}
+            print(f"[MODEL] Swapped in '{name}' version {model.version}")
+
+    def watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check_for_updates()
+
+    def start(self):
+        threading.Thread(target=self.watch, name="model-watch", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
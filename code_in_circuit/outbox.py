@@ -0,0 +1,144 @@
+import sqlite3
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+
+class Outbox:
+    """Store-and-forward wrapper around the MQTT client's publish().
+
+    While the broker is reachable and nothing is buffered, messages go
+    straight out. Otherwise they are appended to a small SQLite ring buffer
+    (WAL mode) and drained in batches, in order: while a backlog exists new
+    messages queue behind it, so nothing overtakes an older message. Payloads
+    are stored untouched, so the timestamps the device put in them are
+    preserved.
+
+    Outbox.publish() has the same call shape as client.publish(), so it can be
+    handed to anything that only needs to publish.
+    """
+
+    def __init__(
+        self,
+        client,
+        path: str = "outbox.db",
+        max_messages: int = 5000,
+        batch_size: int = 50,
+        batch_interval: float = 1.0,
+    ):
+        self.client = client
+        self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self._lock = threading.Lock()
+        self._connected = threading.Event()
+        self._draining = False
+        self._backlog = False  # rows in the table not yet delivered
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "topic TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "qos INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.commit()
+        self._backlog = self.pending() > 0
+
+    # -------------------- CONNECTION STATE --------------------
+
+    def on_connect(self):
+        self._connected.set()
+        if self._backlog:
+            self._start_drain()
+
+    def on_disconnect(self):
+        self._connected.clear()
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # -------------------- PUBLISH --------------------
+
+    def publish(self, topic: str, payload: str, qos: int = 0) -> bool:
+        """Publish now if connected and nothing is buffered, otherwise
+        queue behind the backlog. Returns True if sent."""
+        with self._lock:
+            direct = self._connected.is_set() and not self._backlog
+        if direct and self._send(topic, payload, qos):
+            return True
+        self._store(topic, payload, qos)
+        if self._connected.is_set():
+            self._start_drain()
+        return False
+
+    def _send(self, topic: str, payload: str, qos: int) -> bool:
+        try:
+            info = self.client.publish(topic, payload, qos=qos)
+            return info.rc == mqtt.MQTT_ERR_SUCCESS
+        except Exception as e:
+            print(f"[OUTBOX] Publish failed: {e}")
+            return False
+
+    def _store(self, topic: str, payload: str, qos: int):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO outbox (topic, payload, qos) VALUES (?, ?, ?)",
+                (topic, payload, qos),
+            )
+            # Ring buffer: drop the oldest messages beyond the cap
+            self._db.execute(
+                "DELETE FROM outbox WHERE id <= "
+                "(SELECT MAX(id) FROM outbox) - ?",
+                (self.max_messages,),
+            )
+            self._db.commit()
+            self._backlog = True
+
+    # -------------------- DRAIN --------------------
+
+    def _start_drain(self):
+        with self._lock:
+            if self._draining:
+                return
+            self._draining = True
+        threading.Thread(target=self._drain, name="outbox-drain", daemon=True).start()
+
+    def _drain(self):
+        sent = 0
+        try:
+            while self._connected.is_set():
+                with self._lock:
+                    rows = self._db.execute(
+                        "SELECT id, topic, payload, qos FROM outbox ORDER BY id LIMIT ?",
+                        (self.batch_size,),
+                    ).fetchall()
+                    if not rows:
+                        # Decided under the lock, so a message stored right
+                        # now either was selected or finds the drain stopped
+                        self._backlog = False
+                        self._draining = False
+                        break
+
+                delivered = []
+                for row_id, topic, payload, qos in rows:
+                    if not self._send(topic, payload, qos):
+                        break
+                    delivered.append((row_id,))
+                with self._lock:
+                    self._db.executemany("DELETE FROM outbox WHERE id = ?", delivered)
+                    self._db.commit()
+                sent += len(delivered)
+                if len(delivered) < len(rows):
+                    break  # send failed mid-batch, retry on the next connect or publish
+                time.sleep(self.batch_interval)
+        finally:
+            with self._lock:
+                self._draining = False
+            if sent:
+                print(f"[OUTBOX] Drained {sent} buffered messages")
@@ -0,0 +1,268 @@
+import base64
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from crop_dedup import dhash
+from image_encoding import encode_jpeg
+
+# Thứ tự các stage trong báo cáo benchmark
+STAGES = ("decode", "preprocess", "detect", "nms", "dedup", "classify", "encode", "publish")
+
+DETECT_SIZE = 640
+CLASSIFY_SIZE = 96
+JPEG_TARGET_BYTES = 24 * 1024  # Kích thước tối đa mỗi ảnh crop gửi qua MQTT
+
+LABELS = [
+    "Bacterial Spot",
+    "Early Blight",
+    "Healthy",
+    "Late Blight",
+    "Leaf Mold",
+    "Mosaic Virus",
+    "Septoria Leaf Spot",
+    "Target Spot",
+    "Two-spotted Spider Mites",
+    "Yellow Leaf Curl Virus",
+]
+
+
+class StageTimer:
+    """Collect wall-clock durations per pipeline stage.
+
+    `with timer.stage("detect"): ...` appends one sample; a stage that runs
+    once per crop gets one sample per crop. The default timer used by the
+    device keeps nothing.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - started)
+
+    def summary(self) -> dict:
+        """Per stage: count, mean / p50 / p95 / max in milliseconds"""
+        result = {}
+        for name in sorted(self.samples, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+            values = np.array(self.samples[name]) * 1000.0
+            result[name] = {
+                "count": int(values.size),
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return result
+
+
+# ========== Hàm NMS ==========
+def non_max_suppression(boxes, iou_threshold=0.5):
+    if len(boxes) == 0:
+        return np.array([])
+    boxes = boxes[np.argsort(-boxes[:, 4])]
+    selected_boxes = []
+    while len(boxes) > 0:
+        chosen_box = boxes[0]
+        selected_boxes.append(chosen_box)
+        other_boxes = boxes[1:]
+        ious = compute_iou(chosen_box, other_boxes)
+        boxes = other_boxes[ious < iou_threshold]
+    return np.array(selected_boxes)
+
+
+def compute_iou(box, boxes):
+    cx1, cy1, w1, h1 = box[:4]
+    x1_1 = cx1 - w1 / 2
+    y1_1 = cy1 - h1 / 2
+    x2_1 = cx1 + w1 / 2
+    y2_1 = cy1 + h1 / 2
+    cx2, cy2, w2, h2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    x1_2 = cx2 - w2 / 2
+    y1_2 = cy2 - h2 / 2
+    x2_2 = cx2 + w2 / 2
+    y2_2 = cy2 + h2 / 2
+    inter_x1 = np.maximum(x1_1, x1_2)
+    inter_y1 = np.maximum(y1_1, y1_2)
+    inter_x2 = np.minimum(x2_1, x2_2)
+    inter_y2 = np.minimum(y2_1, y2_2)
+    inter_area = np.maximum(0, inter_x2 - inter_x1) * np.maximum(0, inter_y2 - inter_y1)
+    area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
+    area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
+    return inter_area / (area1 + area2 - inter_area + 1e-6)
+
+
+# ========== Các stage ==========
+def preprocess(frame):
+    """BGR frame -> (640x640 RGB PIL image, detector input tensor)"""
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    image = Image.fromarray(frame_rgb).resize((DETECT_SIZE, DETECT_SIZE))
+    img_array = np.array(image, dtype=np.float32) / 255.0
+    return image, np.expand_dims(img_array, axis=0)
+
+
+def invoke(model, input_data):
+    model.interpreter.set_tensor(model.input_details[0]["index"], input_data)
+    model.interpreter.invoke()
+    return model.interpreter.get_tensor(model.output_details[0]["index"])
+
+
+def select_boxes(output, conf_threshold=0.5, iou_threshold=0.5):
+    """YOLOv8 output (1, 4 + classes, N) -> NMS-filtered rows (cx, cy, w, h, conf)"""
+    confidences = output[0][4]
+    mask = confidences > conf_threshold
+    detections = np.transpose(output[0][:, mask])
+    return non_max_suppression(detections, iou_threshold=iou_threshold)
+
+
+def crop_box(image, box):
+    """Crop a normalised box from the 640x640 image, None if it is empty"""
+    cx, cy, bw, bh = box[:4]
+    x_min = max(0, int((cx - bw / 2) * DETECT_SIZE))
+    y_min = max(0, int((cy - bh / 2) * DETECT_SIZE))
+    x_max = min(DETECT_SIZE, int((cx + bw / 2) * DETECT_SIZE))
+    y_max = min(DETECT_SIZE, int((cy + bh / 2) * DETECT_SIZE))
+    if x_max - x_min <= 0 or y_max - y_min <= 0:
+        return None
+    return image.crop((x_min, y_min, x_max, y_max))
+
+
+def classify(classifier, cropped, labels=LABELS):
+    cropped_resized = ImageOps.fit(
+        cropped, (CLASSIFY_SIZE, CLASSIFY_SIZE), method=Image.Resampling.LANCZOS
+    )
+    input_crop = np.array(cropped_resized, dtype=np.float32) / 255.0
+    output_data = invoke(classifier, np.expand_dims(input_crop, axis=0))
+    predicted_class = int(np.argmax(output_data))
+    return labels[predicted_class], float(output_data[0][predicted_class])
+
+
+class DetectionPipeline:
+    """Detect -> NMS -> dedup -> classify -> encode -> publish for one frame.
+
+    Hardware-free: `models` is anything with snapshot() returning LoadedModel-
+    like objects for "yolov8n" and "mobilenetv2", `publisher` anything with
+    publish(topic, payload). The device passes the real registry and outbox,
+    the benchmark passes stand-ins and a StageTimer. A tracing.Tracer also
+    works as the timer (one span per stage) and, passed as `tracer`, adds the
+    traceparent to every published payload.
+    """
+
+    def __init__(
+        self,
+        models,
+        publisher,
+        topic: str,
+        crop_cache=None,
+        labels=LABELS,
+        jpeg_target_bytes: int = JPEG_TARGET_BYTES,
+        timer: StageTimer | None = None,
+        tracer=None,
+        verbose: bool = True,
+    ):
+        self.models = models
+        self.publisher = publisher
+        self.topic = topic
+        self.crop_cache = crop_cache
+        self.labels = labels
+        self.jpeg_target_bytes = jpeg_target_bytes
+        self.timer = timer or StageTimer(enabled=False)
+        self.tracer = tracer
+        self.verbose = verbose
+
+    def _publish(self, payload):
+        with self.timer.stage("publish"):
+            if self.tracer is not None:
+                # Backend spans for this crop continue from the publish span
+                self.tracer.inject(payload)
+            self.publisher.publish(self.topic, json.dumps(payload))
+
+    def run(self, frame, tag=""):
+        """Returns the number of crops published."""
+        timer = self.timer
+        # Snapshot: a model swap during this capture only affects the next one
+        active = self.models.snapshot()
+        detector, classifier = active["yolov8n"], active["mobilenetv2"]
+        model_versions = {name: model.version for name, model in active.items()}
+
+        with timer.stage("preprocess"):
+            image, input_data = preprocess(frame)
+        with timer.stage("detect"):
+            output = invoke(detector, input_data)
+        with timer.stage("nms"):
+            filtered_boxes = select_boxes(output)
+
+        timestamp = int(time.time())
+        captured_at = datetime.now(timezone.utc).isoformat()
+        published = 0
+        for idx, box in enumerate(filtered_boxes):
+            cropped = crop_box(image, box)
+            if cropped is None:
+                continue
+            image_id = f"{timestamp}{tag}_{idx + 1}"
+
+            with timer.stage("dedup"):
+                phash = dhash(cropped)
+                cached = position = None
+                if self.crop_cache is not None:
+                    position = (tag,) + self.crop_cache.position(box[0], box[1])
+                    cached = self.crop_cache.lookup(position, phash, classifier.version)
+
+            if cached is not None:
+                # Near-duplicate: still record the observation, but skip the
+                # classifier, the JPEG encode and the image payload
+                self._publish({
+                    "image_id": image_id,
+                    "prediction": cached["prediction"],
+                    "confidence": cached["confidence"],
+                    "duplicate_of": cached["image_id"],
+                    "phash": f"{phash:016x}",
+                    "timestamp": captured_at,
+                    "model_versions": model_versions,
+                })
+                published += 1
+                if self.verbose:
+                    print(f"[MQTT] Sent duplicate of {cached['image_id']}: {cached['prediction']}")
+                continue
+
+            with timer.stage("classify"):
+                prediction, confidence = classify(classifier, cropped, self.labels)
+
+            with timer.stage("encode"):
+                jpeg, quality = encode_jpeg(cropped, target_bytes=self.jpeg_target_bytes)
+                img_base64 = base64.b64encode(jpeg).decode("utf-8")
+
+            payload = {
+                "image_id": image_id,
+                "prediction": prediction,
+                "confidence": round(confidence, 6),
+                "image_data": img_base64,
+                "jpeg_quality": quality,
+                "phash": f"{phash:016x}",
+                "timestamp": captured_at,
+                "model_versions": model_versions,
+            }
+            if self.crop_cache is not None:
+                self.crop_cache.store(
+                    position, phash, image_id, prediction, payload["confidence"], classifier.version
+                )
+            self._publish(payload)
+            published += 1
+            if self.verbose:
+                print(f"[MQTT] Sent detection: {prediction} ({payload['confidence']})")
+        return published
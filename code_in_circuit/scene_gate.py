@@ -0,0 +1,97 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class SceneGate:
+    """Cheap change detection in front of the YOLO pass.
+
+    Each candidate frame is shrunk to a small grayscale thumbnail and compared
+    with the thumbnail of the last analysed frame (mean absolute difference,
+    0..1). Below `threshold` the scene is considered unchanged and detection is
+    skipped, unless `max_age` seconds passed since the last analysis.
+
+    `rois` optionally restricts both the comparison and the detection to
+    plant regions, given as normalised (x0, y0, x1, y1) boxes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.02,
+        thumb_size: tuple = (64, 48),
+        rois: list | None = None,
+        max_age: float = 6 * 3600,
+    ):
+        self.threshold = threshold
+        self.thumb_size = thumb_size
+        self.rois = rois or [(0.0, 0.0, 1.0, 1.0)]
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._reference = None
+        self._analysed_at = None
+        self._detect_time = None
+        self.stats = {"checked": 0, "skipped": 0, "saved_seconds": 0.0}
+
+    def regions(self, frame) -> list:
+        """Crop `frame` to each ROI. Returns [(roi_index, sub_frame), ...]."""
+        h, w = frame.shape[:2]
+        regions = []
+        for idx, (x0, y0, x1, y1) in enumerate(self.rois):
+            sub = frame[int(y0 * h) : int(y1 * h), int(x0 * w) : int(x1 * w)]
+            if sub.size:
+                regions.append((idx, sub))
+        return regions
+
+    def _thumbnail(self, frame):
+        parts = []
+        for _, sub in self.regions(frame):
+            gray = cv2.cvtColor(sub, cv2.COLOR_BGR2GRAY)
+            parts.append(cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA))
+        thumb = np.stack(parts).astype(np.float32) / 255.0
+        # Normalise brightness so clouds or auto-exposure alone don't count as change
+        return thumb - thumb.mean()
+
+    def check(self, frame, force: bool = False) -> tuple:
+        """Return (analyse, score) for this frame."""
+        thumb = self._thumbnail(frame)
+        with self._lock:
+            self.stats["checked"] += 1
+            if self._reference is None:
+                score = 1.0
+            else:
+                score = float(np.abs(thumb - self._reference).mean())
+
+            stale = (
+                self._analysed_at is None
+                or time.monotonic() - self._analysed_at >= self.max_age
+            )
+            if force or stale or score >= self.threshold:
+                self._reference = thumb
+                self._analysed_at = time.monotonic()
+                return True, score
+
+            self.stats["skipped"] += 1
+            if self._detect_time is not None:
+                self.stats["saved_seconds"] += self._detect_time
+            return False, score
+
+    def record_detection_time(self, seconds: float):
+        """Feed back how long an analysis took, for the saved-time estimate."""
+        with self._lock:
+            if self._detect_time is None:
+                self._detect_time = seconds
+            else:
+                self._detect_time += 0.2 * (seconds - self._detect_time)
+
+    def report(self) -> dict:
+        with self._lock:
+            checked = self.stats["checked"]
+            return {
+                "checked": checked,
+                "skipped": self.stats["skipped"],
+                "skip_rate": round(self.stats["skipped"] / checked, 3) if checked else 0.0,
+                "saved_seconds": round(self.stats["saved_seconds"], 1),
+            }
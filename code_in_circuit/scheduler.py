@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class IntervalScheduler:
+    """Run named periodic jobs from a single thread, ordered by a heap.
+
+    Each job keeps its own interval, which can be changed while the scheduler
+    is running (e.g. from a settings update). Changing an interval pushes a new
+    heap entry and bumps the job's generation, so the stale entry is simply
+    dropped when it reaches the top of the heap.
+    """
+
+    def __init__(self, after_tick=None):
+        # after_tick(names) is called once per wake-up with the jobs that ran,
+        # so jobs due at the same moment can share one publish
+        self.after_tick = after_tick
+        self._jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+
+    def add_job(self, name: str, func, interval: float, run_now: bool = True):
+        with self._cond:
+            self._jobs[name] = {
+                "func": func,
+                "interval": float(interval),
+                "generation": 0,
+                "last_run": None,
+            }
+            due = time.monotonic() if run_now else time.monotonic() + interval
+            self._push(name, due)
+            self._cond.notify()
+
+    def set_interval(self, name: str, interval: float):
+        """Change a job's interval. The next run is counted from its last run."""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None or job["interval"] == float(interval):
+                return
+            job["interval"] = float(interval)
+            job["generation"] += 1
+            base = job["last_run"] if job["last_run"] is not None else time.monotonic()
+            self._push(name, max(time.monotonic(), base + job["interval"]))
+            self._cond.notify()
+        print(f"[SCHED] '{name}' interval set to {interval:.0f}s")
+
+    def intervals(self) -> dict:
+        with self._cond:
+            return {name: job["interval"] for name, job in self._jobs.items()}
+
+    def _push(self, name: str, due: float):
+        generation = self._jobs[name]["generation"]
+        heapq.heappush(self._heap, (due, next(self._seq), name, generation))
+
+    def _pop_due(self) -> list:
+        """Wait until at least one job is due and return every due job."""
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    break
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._cond.wait(timeout)
+            if not self._running:
+                return []
+
+            due = []
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, name, generation = heapq.heappop(self._heap)
+                job = self._jobs[name]
+                if generation != job["generation"]:
+                    continue  # superseded by set_interval
+                job["last_run"] = now
+                self._push(name, now + job["interval"])
+                due.append((name, job["func"]))
+            return due
+
+    def run(self):
+        self._running = True
+        while self._running:
+            ran = []
+            for name, func in self._pop_due():
+                try:
+                    func()
+                    ran.append(name)
+                except Exception as e:
+                    print(f"[ERROR] Scheduled job '{name}' failed: {e}")
+            if ran and self.after_tick:
+                try:
+                    self.after_tick(ran)
+                except Exception as e:
+                    print(f"[ERROR] Scheduler tick hook failed: {e}")
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
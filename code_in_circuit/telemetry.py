@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class TelemetryReporter:
+    """Decide which sensor samples actually go out over MQTT.
+
+    Two modes:
+      - "deadband": publish a sample only when a field moved more than its
+        deadband since the last published reading, or when `heartbeat`
+        seconds passed without any publish.
+      - "aggregate": collect samples for `window` seconds and publish one
+        min/mean/max summary per field for the whole window.
+    """
+
+    def __init__(
+        self,
+        client,
+        topic: str,
+        mode: str = "deadband",
+        deadbands: dict | None = None,
+        window: float = 900,
+        heartbeat: float = 1800,
+    ):
+        if mode not in ("deadband", "aggregate"):
+            raise ValueError(f"Unknown telemetry mode: {mode}")
+        self.client = client
+        self.topic = topic
+        self.mode = mode
+        self.deadbands = deadbands or {}
+        self.window = window
+        self.heartbeat = heartbeat
+
+        self._lock = threading.Lock()
+        self._last_sent = None
+        self._last_sent_at = None
+        self._samples = []
+        self._window_start = None
+        self.stats = {"samples": 0, "published": 0}
+
+    def add_sample(self, reading: dict) -> bool:
+        """Feed one sample. Returns True if a message was published."""
+        with self._lock:
+            self.stats["samples"] += 1
+            if self.mode == "aggregate":
+                payload = self._add_to_window(reading)
+            else:
+                payload = self._check_deadband(reading)
+        if payload is None:
+            return False
+        return self._publish(payload)
+
+    def flush(self) -> bool:
+        """Publish whatever is left in the current window."""
+        with self._lock:
+            payload = self._close_window() if self._samples else None
+        if payload is None:
+            return False
+        return self._publish(payload)
+
+    # -------------------- DEADBAND --------------------
+
+    def _check_deadband(self, reading: dict):
+        now = time.monotonic()
+        if (
+            self._last_sent is None
+            or now - self._last_sent_at >= self.heartbeat
+            or self._moved(reading)
+        ):
+            self._last_sent = dict(reading)
+            self._last_sent_at = now
+            return {**reading, "timestamp": datetime.now(timezone.utc).isoformat()}
+        return None
+
+    def _moved(self, reading: dict) -> bool:
+        for key, value in reading.items():
+            last = self._last_sent.get(key)
+            if value is None or last is None:
+                if value != last:
+                    return True
+                continue
+            if abs(value - last) > self.deadbands.get(key, 0):
+                return True
+        return False
+
+    # -------------------- AGGREGATE --------------------
+
+    def _add_to_window(self, reading: dict):
+        now = time.monotonic()
+        if self._window_start is None:
+            self._window_start = (now, datetime.now(timezone.utc))
+        self._samples.append(reading)
+        if now - self._window_start[0] >= self.window:
+            return self._close_window()
+        return None
+
+    def _close_window(self) -> dict:
+        payload = {
+            "aggregate": True,
+            "count": len(self._samples),
+            "window_start": self._window_start[1].isoformat(),
+            "window_end": datetime.now(timezone.utc).isoformat(),
+        }
+        keys = {key for sample in self._samples for key in sample}
+        for key in keys:
+            values = [s[key] for s in self._samples if s.get(key) is not None]
+            if values:
+                payload[key] = {
+                    "min": min(values),
+                    "mean": round(sum(values) / len(values), 3),
+                    "max": max(values),
+                }
+        self._samples = []
+        self._window_start = None
+        return payload
+
+    def _publish(self, payload: dict) -> bool:
+        try:
+            self.client.publish(self.topic, json.dumps(payload))
+        except Exception as e:
+            print(f"[ERROR] Failed to publish telemetry: {e}")
+            return False
+        with self._lock:
+            self.stats["published"] += 1
+        print(f"[MQTT] Sent sensor data: {payload}")
+        return True
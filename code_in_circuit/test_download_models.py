@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+import pytest
+
+import download_models as dm
+
+BASE_URL = "http://models.test/"
+
+
+class ModelServer:
+    """Local stand-in for the model host: Range, If-Range and ETag like a CDN."""
+
+    def __init__(self, files: dict):
+        self.files = files
+        self.requests = []
+
+    def etag(self, name):
+        return '"' + hashlib.md5(self.files[name]).hexdigest() + '"'
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        name = request.url.path.lstrip("/")
+        body = self.files[name]
+        headers = {"etag": self.etag(name)}
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range == headers["etag"]):
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(body):
+                return httpx.Response(416, headers=headers)
+            return httpx.Response(206, content=body[start:], headers=headers)
+        return httpx.Response(200, content=body, headers=headers)
+
+    def client(self):
+        return dm.make_client(transport=httpx.MockTransport(self.handle))
+
+
+def download(server, tmp_path, version, sha256=None):
+    async def run():
+        async with server.client() as client:
+            await dm.download_model(
+                client, "leaf", version, "leaf.tflite", sha256=sha256,
+                base_url=BASE_URL, model_dir=tmp_path,
+            )
+
+    asyncio.run(run())
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_part(tmp_path, data: bytes, meta=None):
+    part_path, meta_path = dm.part_paths(tmp_path, "leaf.tflite")
+    part_path.write_bytes(data)
+    if meta is not None:
+        meta_path.write_text(json.dumps(meta))
+    return part_path, meta_path
+
+
+def test_fresh_download_installs_and_cleans_up(tmp_path):
+    server = ModelServer({"leaf.tflite": b"NEWMODEL"})
+    download(server, tmp_path, "2", sha256=sha(b"NEWMODEL"))
+
+    part_path, meta_path = dm.part_paths(tmp_path, "leaf.tflite")
+    assert (tmp_path / "leaf.tflite").read_bytes() == b"NEWMODEL"
+    assert dm.get_local_version("leaf", tmp_path) == "2"
+    assert not part_path.exists() and not meta_path.exists()
+
+
+def test_resumes_same_version_with_if_range(tmp_path):
+    server = ModelServer({"leaf.tflite": b"NEWMODEL"})
+    write_part(tmp_path, b"NEW", {"version": "2", "etag": server.etag("leaf.tflite")})
+    download(server, tmp_path, "2", sha256=sha(b"NEWMODEL"))
+
+    assert (tmp_path / "leaf.tflite").read_bytes() == b"NEWMODEL"
+    assert server.requests[0].headers["range"] == "bytes=3-"
+    assert server.requests[0].headers["if-range"] == server.etag("leaf.tflite")
+
+
+@pytest.mark.parametrize("meta", [None, {"version": "1", "etag": '"old"'}])
+def test_partial_from_other_version_is_discarded(tmp_path, meta):
+    server = ModelServer({"leaf.tflite": b"NNNNN"})
+    write_part(tmp_path, b"OO", meta)
+    download(server, tmp_path, "2")
+
+    assert (tmp_path / "leaf.tflite").read_bytes() == b"NNNNN"
+    assert "range" not in server.requests[0].headers
+
+
+def test_changed_file_restarts_via_if_range(tmp_path):
+    server = ModelServer({"leaf.tflite": b"NNNNN"})
+    write_part(tmp_path, b"OO", {"version": "2", "etag": '"stale"'})
+    download(server, tmp_path, "2", sha256=sha(b"NNNNN"))
+
+    assert (tmp_path / "leaf.tflite").read_bytes() == b"NNNNN"
+
+
+def test_unverified_resume_is_fetched_again(tmp_path):
+    # 416 claims the partial file is complete; without a checksum it is not trusted
+    server = ModelServer({"leaf.tflite": b"NNNNN"})
+    write_part(tmp_path, b"OOOOO", {"version": "2", "etag": server.etag("leaf.tflite")})
+    download(server, tmp_path, "2")
+
+    assert (tmp_path / "leaf.tflite").read_bytes() == b"NNNNN"
+    assert [r.headers.get("range") for r in server.requests] == ["bytes=5-", None]
+
+
+def test_checksum_mismatch_keeps_installed_model(tmp_path):
+    server = ModelServer({"leaf.tflite": b"CORRUPT"})
+    (tmp_path / "leaf.tflite").write_bytes(b"OLDMODEL")
+    with pytest.raises(dm.ChecksumError):
+        download(server, tmp_path, "2", sha256=sha(b"NEWMODEL"))
+
+    part_path, meta_path = dm.part_paths(tmp_path, "leaf.tflite")
+    assert (tmp_path / "leaf.tflite").read_bytes() == b"OLDMODEL"
+    assert not part_path.exists() and not meta_path.exists()
@@ -1,16 +1,22 @@
 import cv2
-import numpy as np
 import tflite_runtime.interpreter as tflite
-from PIL import Image, ImageDraw, ImageOps
 from urllib.parse import quote_plus
-import os
 import time
-import base64
-import io
-import json
 import threading
+import queue
 import paho.mqtt.client as mqtt
 
+from command_dispatch import CommandDispatcher, TOPIC_COMMAND, TOPIC_SETTINGS
+from scheduler import IntervalScheduler
+from telemetry import TelemetryReporter
+from outbox import Outbox
+from watering import WateringController
+from model_registry import ModelRegistry
+from crop_dedup import CropCache
+from scene_gate import SceneGate
+from pipeline import DetectionPipeline
+from tracing import JsonlExporter, OtlpHttpExporter, Tracer, profiled
+
 # Sensor imports
 import busio, digitalio
 from sensors import config_soil_sensor as soil
@@ -24,30 +30,65 @@ MQTT_BROKER = "test.mosquitto.org"
 MQTT_PORT = 1883
 TOPIC_SENSOR = "pizero2w/sensorreading"
 TOPIC_INFERENCE = "pizero2w/inference"
-TOPIC_COMMAND = "pizero2w/commands"
+
+# ========== TRACING ==========
+# Lệnh từ backend mang traceparent; chụp định kỳ tự lấy mẫu theo TRACE_SAMPLE_RATE.
+# Span được ghi ra TRACE_FILE, hoặc gửi tới collector OTLP nếu có URL.
+TRACE_SAMPLE_RATE = 0.1
+TRACE_FILE = "traces.jsonl"
+TRACE_FILE_MAX_BYTES = 2 * 1024 * 1024  # Xoay vòng sang traces.jsonl.1 để không đầy thẻ SD
+TRACE_COLLECTOR_URL = None  # ví dụ "http://192.168.2.10:4318/v1/traces"
+tracer = Tracer(
+    "tomatobuddy-edge",
+    exporter=(
+        OtlpHttpExporter(TRACE_COLLECTOR_URL)
+        if TRACE_COLLECTOR_URL
+        else JsonlExporter(TRACE_FILE, max_bytes=TRACE_FILE_MAX_BYTES)
+    ),
+    sample_rate=TRACE_SAMPLE_RATE,
+)
 
 client = mqtt.Client()
+# Mọi bản tin gửi đi đều qua outbox để không mất dữ liệu khi rớt mạng
+outbox = Outbox(client, path="outbox.db")
+dispatcher = CommandDispatcher(outbox, tracer=tracer)
 
-# ========== GLOBAL FLAG ==========
-capture_requested = False
 
+def on_connect(client, userdata, flags, rc):
+    if rc != 0:
+        print(f"[MQTT] Connection refused: rc={rc}")
+        return
+    print("[MQTT] Connected to broker")
+    # Subscribe here so the subscriptions survive a broker reconnect
+    # Settings are retained on the broker: subscribing delivers the latest ones
+    client.subscribe([(TOPIC_COMMAND, 0), (TOPIC_SETTINGS, 1)])
+    outbox.on_connect()
 
-def on_message(client, userdata, msg):
-    global capture_requested
-    try:
-        data = json.loads(msg.payload.decode())
-        if data.get("command") == "capture":
-            print("[MQTT] Capture command received!")
-            capture_requested = True
-    except Exception as e:
-        print(f"[ERROR] Invalid MQTT message: {e}")
 
+def on_disconnect(client, userdata, rc):
+    print(f"[MQTT] Disconnected (rc={rc}), buffering outgoing messages")
+    outbox.on_disconnect()
 
-client.on_message = on_message
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-client.subscribe(TOPIC_COMMAND)
+
+client.on_connect = on_connect
+client.on_disconnect = on_disconnect
+client.on_message = dispatcher.on_message
+# connect_async: không crash khi broker chưa sẵn sàng, loop tự kết nối lại
+client.reconnect_delay_set(min_delay=1, max_delay=60)
+client.connect_async(MQTT_BROKER, MQTT_PORT, 60)
 client.loop_start()
 
+# ========== DEVICE SETTINGS ==========
+# Cập nhật từ topic pizero2w/settings, mặc định giống backend
+settings_lock = threading.Lock()
+device_settings = {
+    "image_capture_interval": 720,
+    "temp_humidity_interval": 360,
+    "light_intensity_interval": 360,
+    "soil_moisture_interval": 360,
+    "water_level_interval": 360,
+}
+
 # ========== RTSP CONFIG ==========
 USER = "admin"
 PWD_RAW = "L294BD22"
@@ -57,32 +98,41 @@ URL = f"rtsp://{USER}:{PWD}@{IP_CAM}:554/cam/realmonitor?channel=1&subtype=1"
 cap = cv2.VideoCapture(URL)
 if not cap.isOpened():
     raise RuntimeError("Không mở được RTSP stream")
+# cv2.VideoCapture is not thread-safe, so only camera_thread touches `cap`.
+# A capture posts a request here and the camera thread decodes the next
+# grabbed frame for it: no lock contention, latency of at most one frame.
+frame_requests = queue.Queue()
+FRAME_TIMEOUT = 5.0
+
+# Chụp định kỳ chỉ chạy YOLO khi khung hình thay đổi đáng kể.
+# PLANT_ROIS: vùng chứa cây (x0, y0, x1, y1, tỉ lệ 0..1), None = cả khung hình
+PLANT_ROIS = None
+# Dù cảnh không đổi, vẫn phân tích lại sau mỗi SCENE_MAX_AGE_CAPTURES lần chụp định kỳ
+# (max_age được tính lại từ image_capture_interval trong apply_intervals)
+SCENE_MAX_AGE_CAPTURES = 4
+scene_gate = SceneGate(threshold=0.02, rois=PLANT_ROIS)
 
 # ========== LOAD MODELS ==========
-interpreter = tflite.Interpreter(model_path="model/Yolov8n/best_float32.tflite")
-interpreter.allocate_tensors()
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
-
-interpreter_cls = tflite.Interpreter(
-    model_path="model/Mobilenetv2/mobilenetv2_float32.tflite"
+# Tên model phải trùng với key trong version.json của download_models.py
+MODEL_SPECS = {
+    "yolov8n": {
+        "filename": "best_float32.tflite",
+        "fallback": "model/Yolov8n/best_float32.tflite",
+    },
+    "mobilenetv2": {
+        "filename": "mobilenetv2_float32.tflite",
+        "fallback": "model/Mobilenetv2/mobilenetv2_float32.tflite",
+    },
+}
+models = ModelRegistry(
+    MODEL_SPECS,
+    interpreter_factory=lambda path: tflite.Interpreter(model_path=path),
+    model_dir="models",
 )
-interpreter_cls.allocate_tensors()
-input_cls = interpreter_cls.get_input_details()
-output_cls = interpreter_cls.get_output_details()
-
-labels = [
-    "Bacterial Spot",
-    "Early Blight",
-    "Healthy",
-    "Late Blight",
-    "Leaf Mold",
-    "Mosaic Virus",
-    "Septoria Leaf Spot",
-    "Target Spot",
-    "Two-spotted Spider Mites",
-    "Yellow Leaf Curl Virus",
-]
+models.load_initial()
+
+# Lá gần như giống lần chụp trước ở cùng vị trí → dùng lại kết quả phân loại
+crop_cache = CropCache(grid=16, max_distance=6, max_age=24 * 3600)
 
 # ========== MCP3008 setup ==========
 spi = busio.SPI(
@@ -93,157 +143,206 @@ mcp = MCP.MCP3008(spi, cs)
 soil_channel = AnalogIn(mcp, soil.SOIL_SENSOR_CHANNEL)
 
 
-# ========== Hàm NMS ==========
-def non_max_suppression(boxes, iou_threshold=0.5):
-    if len(boxes) == 0:
-        return np.array([])
-    boxes = boxes[np.argsort(-boxes[:, 4])]
-    selected_boxes = []
-    while len(boxes) > 0:
-        chosen_box = boxes[0]
-        selected_boxes.append(chosen_box)
-        other_boxes = boxes[1:]
-        ious = compute_iou(chosen_box, other_boxes)
-        boxes = other_boxes[ious < iou_threshold]
-    return np.array(selected_boxes)
-
-
-def compute_iou(box, boxes):
-    cx1, cy1, w1, h1 = box[:4]
-    x1_1 = cx1 - w1 / 2
-    y1_1 = cy1 - h1 / 2
-    x2_1 = cx1 + w1 / 2
-    y2_1 = cy1 + h1 / 2
-    cx2, cy2, w2, h2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
-    x1_2 = cx2 - w2 / 2
-    y1_2 = cy2 - h2 / 2
-    x2_2 = cx2 + w2 / 2
-    y2_2 = cy2 + h2 / 2
-    inter_x1 = np.maximum(x1_1, x1_2)
-    inter_y1 = np.maximum(y1_1, y1_2)
-    inter_x2 = np.minimum(x2_1, x2_2)
-    inter_y2 = np.minimum(y2_1, y2_2)
-    inter_area = np.maximum(0, inter_x2 - inter_x1) * np.maximum(0, inter_y2 - inter_y1)
-    area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-    area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-    return inter_area / (area1 + area2 - inter_area + 1e-6)
+# ========== Hàm chạy detection và publish ==========
+# Các stage (tiền xử lý, YOLO, NMS, phân loại, mã hóa, gửi) nằm trong
+# pipeline.py để benchmark.py chạy được mà không cần phần cứng
+detection = DetectionPipeline(
+    models,
+    outbox,
+    TOPIC_INFERENCE,
+    crop_cache=crop_cache,
+    timer=tracer,
+    tracer=tracer,
+)
+
 
+def run_detection(frame, tag=""):
+    detection.run(frame, tag=tag)
 
-# ========== Hàm chạy detection và publish ==========
-def run_detection(frame):
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    image = Image.fromarray(frame_rgb).resize((640, 640))
-    img_array = np.array(image, dtype=np.float32) / 255.0
-    input_data = np.expand_dims(img_array, axis=0)
-
-    interpreter.set_tensor(input_details[0]["index"], input_data)
-    interpreter.invoke()
-    output = interpreter.get_tensor(output_details[0]["index"])
-
-    confidences = output[0][4]
-    mask = confidences > 0.5
-    detections = output[0][:, mask]
-    detections = np.transpose(detections)
-    filtered_boxes = non_max_suppression(detections, iou_threshold=0.5)
-
-    timestamp = int(time.time())
-    for idx, box in enumerate(filtered_boxes):
-        cx, cy, bw, bh, _ = box
-        x_min = max(0, int((cx - bw / 2) * 640))
-        y_min = max(0, int((cy - bh / 2) * 640))
-        x_max = min(640, int((cx + bw / 2) * 640))
-        y_max = min(640, int((cy + bh / 2) * 640))
-
-        if x_max - x_min > 0 and y_max - y_min > 0:
-            cropped = image.crop((x_min, y_min, x_max, y_max))
-            cropped_resized = ImageOps.fit(
-                cropped, (96, 96), method=Image.Resampling.LANCZOS
-            )
-
-            input_crop = np.array(cropped_resized, dtype=np.float32) / 255.0
-            input_crop = np.expand_dims(input_crop, axis=0)
-
-            interpreter_cls.set_tensor(input_cls[0]["index"], input_crop)
-            interpreter_cls.invoke()
-            output_data = interpreter_cls.get_tensor(output_cls[0]["index"])
-            predicted_class = int(np.argmax(output_data))
-            confidence = float(output_data[0][predicted_class])
-
-            buffered = io.BytesIO()
-            cropped.save(buffered, format="JPEG")
-            img_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-            image_id = f"{timestamp}_{idx + 1}"
-            payload = {
-                "image_id": image_id,
-                "prediction": labels[predicted_class],
-                "confidence": round(confidence, 6),
-                "image_data": img_base64,
-            }
-            client.publish(TOPIC_INFERENCE, json.dumps(payload))
-            print(
-                f"[MQTT] Sent detection: {payload['prediction']} ({payload['confidence']})"
-            )
-
-
-# ========== Thread 1: Camera & Capture ==========
-def detection_thread():
-    global capture_requested
+
+# ========== Command handlers ==========
+PUMP_FLOW_ML_PER_S = 20.0  # Lưu lượng bơm, cần hiệu chỉnh theo thực tế
+
+# Vòng điều khiển bơm riêng: lọc median/EMA, hysteresis khô/ướt, giới hạn thời gian bơm
+watering = WateringController(
+    pump.pump_relay,
+    read_moisture=lambda: soil_channel.value,
+    publisher=outbox,
+    dry_threshold=20000,
+    wet_threshold=23000,
+    max_on_time=30,
+    flow_ml_per_s=PUMP_FLOW_ML_PER_S,
+)
+
+
+def latest_frame(timeout: float = FRAME_TIMEOUT):
+    request = {"done": threading.Event(), "frame": None}
+    frame_requests.put(request)
+    if not request["done"].wait(timeout):
+        return None
+    return request["frame"]
+
+
+def handle_capture(params):
+    with tracer.span("decode"):
+        frame = latest_frame()
+    if frame is None:
+        print("[ERROR] No frame available for capture")
+        return False
+
+    # Lệnh capture thủ công luôn chạy; chụp định kỳ đi qua scene gate
+    analyse, score = scene_gate.check(frame, force=not params.get("periodic"))
+    report = scene_gate.report()
+    if not analyse:
+        print(f"[INFO] Scene unchanged (score {score:.3f}), skipping detection")
+        return {"success": True, "skipped": True, "scene_score": round(score, 4), **report}
+
+    print("[INFO] Capturing frame now...")
+    started = time.monotonic()
+    regions = scene_gate.regions(frame)
+    # {"profile": true} trong lệnh capture: ghi thêm file profile của lần chụp này
+    with profiled("capture", enabled=bool(params.get("profile"))):
+        for roi_index, region in regions:
+            run_detection(region, tag=f"r{roi_index}" if len(regions) > 1 else "")
+    scene_gate.record_detection_time(time.monotonic() - started)
+    return {"success": True, "skipped": False, "scene_score": round(score, 4), **report}
+
+
+def handle_water(params):
+    amount = float(params.get("amount", 300))
+    print(f"[CMD] Watering {amount:.0f}ml")
+    return watering.request_dose(amount)
+
+
+def handle_settings(params):
+    with settings_lock:
+        device_settings.update(
+            {k: int(v) for k, v in params.items() if k in device_settings}
+        )
+        print(f"[CMD] Settings updated: {device_settings}")
+    apply_intervals()
+    return True
+
+
+dispatcher.register(
+    "capture",
+    handle_capture,
+    # Gộp lệnh trùng: chỉ coi là chụp định kỳ khi cả hai đều định kỳ
+    merge=lambda old, new: {"periodic": bool(old.get("periodic") and new.get("periodic"))},
+)
+dispatcher.register("water", handle_water)
+dispatcher.register("settings", handle_settings)
+
+
+# ========== Thread 1: Camera ==========
+def camera_thread():
+    # grab() keeps the RTSP buffer drained without decoding every frame;
+    # a capture only decodes the most recent one via latest_frame()
     while True:
-        ret, frame = cap.read()
+        ret = cap.grab()
         if not ret:
             print("[ERROR] Cannot read frame from RTSP")
             break
+        if frame_requests.empty():
+            continue
+        ret, frame = cap.retrieve()
+        while not frame_requests.empty():
+            request = frame_requests.get_nowait()
+            request["frame"] = frame if ret else None
+            request["done"].set()
 
-        # Nếu có lệnh capture → chạy ngay
-        if capture_requested:
-            print("[INFO] Capturing frame now...")
-            run_detection(frame)
-            capture_requested = False
 
-        time.sleep(0.5)
+# ========== Thread 2: Scheduled sensor jobs ==========
+# Giá trị đọc gần nhất của từng cảm biến, gửi chung một bản tin mỗi tick
+latest_reading = {"temp": None, "humidity": None, "moisture": None}
+SENSOR_JOBS = ("temp_humidity_interval", "soil_moisture_interval")
 
 
-# ========== Thread 2: Sensor reading & Pump control ==========
-def sensor_thread():
-    while True:
-        soil_value = soil_channel.value
-        soil_voltage = soil_channel.voltage
-        print(f"Soil: {soil_value}, Voltage: {soil_voltage:.2f} V")
-
-        temp = None
-        hum = None
-        try:
-            temp = dht.dht_device.temperature
-            hum = dht.dht_device.humidity
-            print(f"Temp: {temp}°C   Humidity: {hum}%")
-        except Exception as e:
-            print("DHT read error:", e)
-
-        if soil_channel.value < 20000:
-            print("Soil dry! Turning pump ON")
-            pump.pump_relay.value = True
-        else:
-            print("Soil wet enough. Turning pump OFF")
-            pump.pump_relay.value = False
-
-        payload = {"temp": temp, "humidity": hum, "moisture": soil_value}
-        client.publish(TOPIC_SENSOR, json.dumps(payload))
-        print(f"[MQTT] Sent sensor data: {payload}")
-        print("-" * 30)
-        time.sleep(5)
+def read_temp_humidity():
+    try:
+        latest_reading["temp"] = dht.dht_device.temperature
+        latest_reading["humidity"] = dht.dht_device.humidity
+        print(f"Temp: {latest_reading['temp']}°C   Humidity: {latest_reading['humidity']}%")
+    except Exception as e:
+        print("DHT read error:", e)
+
+
+def read_soil_moisture():
+    # Dùng giá trị đã lọc của bộ điều khiển bơm, tránh đọc ADC thêm lần nữa
+    moisture = watering.moisture
+    if moisture is None:
+        moisture = soil_channel.value
+    latest_reading["moisture"] = round(moisture)
+    print(f"Soil: {latest_reading['moisture']}")
+
+
+def request_capture():
+    dispatcher.submit("capture", {"periodic": True})
+
+
+# "deadband": chỉ gửi khi giá trị thay đổi đủ lớn (kèm heartbeat)
+# "aggregate": gửi min/mean/max cho mỗi cửa sổ thời gian
+TELEMETRY_MODE = "deadband"
+telemetry = TelemetryReporter(
+    outbox,
+    TOPIC_SENSOR,
+    mode=TELEMETRY_MODE,
+    deadbands={"temp": 0.5, "humidity": 2.0, "moisture": 500},
+    window=15 * 60,
+    heartbeat=30 * 60,
+)
+
+
+def publish_readings(ran):
+    if not any(name in SENSOR_JOBS for name in ran):
+        return
+    telemetry.add_sample(dict(latest_reading))
+
+
+scheduler = IntervalScheduler(after_tick=publish_readings)
+# Không có cảm biến ánh sáng / mực nước nên light_intensity_interval và
+# water_level_interval chưa được lên lịch
+scheduler.add_job("temp_humidity_interval", read_temp_humidity, 60)
+scheduler.add_job("soil_moisture_interval", read_soil_moisture, 60)
+scheduler.add_job("image_capture_interval", request_capture, 60, run_now=False)
+
+
+def apply_intervals():
+    """Push the interval settings (minutes) into the scheduler."""
+    with settings_lock:
+        intervals = dict(device_settings)
+    for name in SENSOR_JOBS + ("image_capture_interval",):
+        scheduler.set_interval(name, max(1, intervals[name]) * 60)
+    # Slightly under N intervals, so scheduler jitter cannot push it to N + 1
+    capture_seconds = max(1, intervals["image_capture_interval"]) * 60
+    scene_gate.max_age = (SCENE_MAX_AGE_CAPTURES - 0.5) * capture_seconds
+
+
+apply_intervals()
 
 
 # ========== MAIN ==========
 try:
-    t1 = threading.Thread(target=detection_thread)
-    t2 = threading.Thread(target=sensor_thread)
+    tracer.start()
+    dispatcher.start()
+    models.start()
+    t1 = threading.Thread(target=camera_thread)
+    t2 = threading.Thread(target=scheduler.run)
+    t3 = threading.Thread(target=watering.run)
     t1.start()
     t2.start()
+    t3.start()
     t1.join()
     t2.join()
+    t3.join()
 except KeyboardInterrupt:
     print("[INFO] Stopped by user")
+    scheduler.stop()
+    watering.stop()
+    models.stop()
+    telemetry.flush()
+    tracer.stop()
+    tracer.flush()
     pump.pump_relay.value = False
     client.loop_stop()
     client.disconnect()
@@ -0,0 +1,214 @@
+import json
+import queue
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+TOPIC_WATERING = "pizero2w/watering"
+
+
+class WateringController:
+    """Pump control loop running on its own thread.
+
+    The raw soil ADC value (higher = wetter) is smoothed with a rolling median
+    followed by an EMA. Automatic watering starts when the filtered value drops
+    below `dry_threshold` and stops once it reaches `wet_threshold`
+    (hysteresis); if `max_on_time` runs out first the session is reported
+    as failed. Manual doses from the `water` command are volume based, with
+    the same `max_on_time` cap.
+
+    Each session is published once on `pizero2w/watering` after a short
+    settle time, with the moisture before and after watering.
+    """
+
+    def __init__(
+        self,
+        relay,
+        read_moisture,
+        publisher,
+        topic: str = TOPIC_WATERING,
+        dry_threshold: float = 20000,
+        wet_threshold: float = 23000,
+        max_on_time: float = 30.0,
+        flow_ml_per_s: float = 20.0,
+        sample_interval: float = 5.0,
+        pump_tick: float = 0.5,
+        settle_time: float = 30.0,
+        cooldown: float = 600.0,
+        median_window: int = 5,
+        ema_alpha: float = 0.3,
+        clock=time.monotonic,
+    ):
+        if wet_threshold <= dry_threshold:
+            raise ValueError("wet_threshold must be above dry_threshold")
+        self.relay = relay
+        self.read_moisture = read_moisture
+        self.publisher = publisher
+        self.topic = topic
+        self.dry_threshold = dry_threshold
+        self.wet_threshold = wet_threshold
+        self.max_on_time = max_on_time
+        self.flow_ml_per_s = flow_ml_per_s
+        self.sample_interval = sample_interval
+        self.pump_tick = pump_tick
+        self.settle_time = settle_time
+        self.cooldown = cooldown
+        self.ema_alpha = ema_alpha
+        self.clock = clock  # replaced by a simulated clock in benchmark.py
+
+        self._samples = []
+        self._median_window = median_window
+        self._filtered = None
+        self._session = None
+        self._auto_blocked_until = 0.0
+        self._requests = queue.Queue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    @property
+    def moisture(self):
+        """Latest filtered moisture value, None before the first sample."""
+        return self._filtered
+
+    def session_budget(self) -> float:
+        """Upper bound on how long one session takes, from start to report."""
+        return self.max_on_time + self.settle_time + self.sample_interval + 2 * self.pump_tick
+
+    def request_dose(self, amount_ml: float, timeout: float | None = None) -> bool:
+        """Water `amount_ml` and block until the session is reported.
+
+        The default timeout covers the session in progress and every dose
+        queued ahead of this one, so a dose that is still delivered is not
+        acknowledged as failed.
+        """
+        done = threading.Event()
+        request = {"amount": float(amount_ml), "done": done, "success": False}
+        ahead = self._requests.qsize() + 1  # queued doses + a running session
+        self._requests.put(request)
+        self._wake.set()
+        if timeout is None:
+            timeout = (ahead + 1) * self.session_budget() + 10
+        if not done.wait(timeout):
+            return False
+        return request["success"]
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # -------------------- CONTROL LOOP --------------------
+
+    def run(self):
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.tick())
+                self._wake.clear()
+        finally:
+            self.relay.value = False
+
+    def tick(self) -> float:
+        """One control-loop iteration. Returns the delay until the next one."""
+        self._sample()
+        if self._session is None:
+            self._maybe_start()
+        else:
+            self._step()
+        return self.sample_interval if self._session is None else self.pump_tick
+
+    def _sample(self):
+        try:
+            raw = float(self.read_moisture())
+        except Exception as e:
+            print(f"[WATER] Moisture read error: {e}")
+            return
+        self._samples.append(raw)
+        self._samples = self._samples[-self._median_window :]
+        median = statistics.median(self._samples)
+        if self._filtered is None:
+            self._filtered = median
+        else:
+            self._filtered += self.ema_alpha * (median - self._filtered)
+
+    def _maybe_start(self):
+        try:
+            request = self._requests.get_nowait()
+        except queue.Empty:
+            request = None
+
+        now = self.clock()
+        if request is not None:
+            self._start("manual", request["amount"], request)
+        elif (
+            self._filtered is not None
+            and self._filtered < self.dry_threshold
+            and now >= self._auto_blocked_until
+        ):
+            self._start("auto", None)
+
+    def _start(self, mode: str, amount: float | None, request=None):
+        """amount=None: no volume target, run until wet or max_on_time."""
+        target = "until wet" if amount is None else f"target {amount:.0f}ml"
+        print(f"[WATER] {mode} watering started ({target})")
+        self._session = {
+            "mode": mode,
+            "target": amount,
+            "request": request,
+            "moisture_before": self._filtered,
+            "started": self.clock(),
+            "stopped": None,
+            "capped": False,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        self.relay.value = True
+
+    def _step(self):
+        session = self._session
+        now = self.clock()
+
+        if session["stopped"] is None:
+            elapsed = now - session["started"]
+            dose_done = (
+                session["target"] is not None
+                and elapsed * self.flow_ml_per_s >= session["target"]
+            )
+            wet = session["mode"] == "auto" and self._filtered >= self.wet_threshold
+            if dose_done or wet or elapsed >= self.max_on_time:
+                self.relay.value = False
+                session["stopped"] = now
+                session["capped"] = not (dose_done or wet)
+                print(f"[WATER] Pump OFF after {elapsed:.1f}s")
+            return
+
+        if now - session["stopped"] >= self.settle_time:
+            self._finish()
+
+    def _finish(self):
+        session, self._session = self._session, None
+        duration = session["stopped"] - session["started"]
+        success = not session["capped"]
+        if session["mode"] == "auto":
+            self._auto_blocked_until = self.clock() + self.cooldown
+
+        def rounded(value):
+            return None if value is None else round(value, 1)
+
+        payload = {
+            "amount": round(duration * self.flow_ml_per_s, 1),
+            "mode": session["mode"],
+            "duration": round(duration, 1),
+            "moisture_before": rounded(session["moisture_before"]),
+            "moisture_after": rounded(self._filtered),
+            "success": success,
+            "timestamp": session["timestamp"],
+        }
+        try:
+            self.publisher.publish(self.topic, json.dumps(payload))
+        except Exception as e:
+            print(f"[ERROR] Failed to publish watering session: {e}")
+        print(f"[WATER] Session reported: {payload}")
+
+        request = session["request"]
+        if request is not None:
+            request["success"] = success
+            request["done"].set()
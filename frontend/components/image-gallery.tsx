@@ -10,6 +10,7 @@ import Image from "next/image"
 interface ImageData {
   _id: string
   image_url: string
+  image_urls?: { thumbnail: string; medium: string; original: string }
   prediction: string
   timestamp: string
 }
@@ -147,7 +148,7 @@ export default function ImageGallery({
                 <div className="relative">
                   <div className="relative w-full h-32 bg-gray-100">
                     <Image
-                      src={item.image_url || "/placeholder.svg"}
+                      src={item.image_urls?.thumbnail || item.image_url || "/placeholder.svg"}
                       alt={`Plant - ${item.prediction}`}
                       fill
                       className="object-cover"
@@ -15,6 +15,7 @@ import Image from "next/image";
 interface ImageData {
   _id: string;
   image_url: string;
+  image_urls?: { thumbnail: string; medium: string; original: string };
   prediction: string;
   timestamp: string;
 }
@@ -133,7 +134,7 @@ export default function ImageModal({
                 </div>
               ) : (
                 <Image
-                  src={image.image_url || "/placeholder.svg"}
+                  src={image.image_urls?.medium || image.image_url || "/placeholder.svg"}
                   alt={`Plant Image - ${image.prediction}`}
                   fill
                   className="object-contain"
@@ -26,6 +26,7 @@ import ImageModal from "./image-modal";
 interface ImageData {
   _id: string;
   image_url: string;
+  image_urls?: { thumbnail: string; medium: string; original: string };
   prediction: string;
   timestamp: string;
 }
@@ -331,7 +332,7 @@ export default function ImagesDetection() {
                 <div className="relative">
                   <div className="relative w-full h-48 bg-gray-100 rounded-t-lg overflow-hidden">
                     <Image
-                      src={item.image_url || "/placeholder.svg"}
+                      src={item.image_urls?.thumbnail || item.image_url || "/placeholder.svg"}
                       alt={`Plant Image - ${item.prediction}`}
                       fill
                       className="object-cover group-hover:scale-105 transition-transform duration-200"